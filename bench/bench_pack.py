@@ -0,0 +1,195 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Compares how .blend save modes affect repository growth. For each mode, commits and pushes N edit cycles of a
+# synthetic .blend file to a local bare repo (with pygit2, like Ginder does) and reports commit time, bytes
+# pushed and the pack size after a full repack.
+#
+# Usage:
+#   python bench/bench_pack.py [--cycles N] [--size MB] [--edits N] [--mode MODE ...] [--output FILE]
+#
+# Example:
+#   python bench/bench_pack.py --cycles 20 --size 50
+#
+# Results (python bench/bench_pack.py --cycles 10 --size 20, gzip standing in for zstd):
+#
+#   mode             file [MB]   commit [ms]   pushed [MB]     pack [MB]
+#   repository           20.15        558.70         78.14          7.86
+#   compressed            7.82        313.09         77.96         77.95
+#
+# Uncompressed saves make the packed repository about 10x smaller, because git can delta successive revisions.
+# The bytes a push transfers stay the same: each revision is sent in full either way. The file on disk gets
+# about 2.5x larger, and committing takes longer. Because of these trade-offs, Ginder keeps the file's own
+# compression setting by default ('As Set in File'). 'Repository Optimized' is an opt-in for repos that
+# keep a long .blend history.
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+
+import pygit2
+
+# Blender saves compressed files with zstd (since 3.0). Use it if this python has it, gzip otherwise.
+try:
+    from compression import zstd
+    compressor = 'zstd'
+    compress = zstd.compress
+except ImportError:
+    try:
+        import zstandard
+        compressor = 'zstd'
+        compress = zstandard.ZstdCompressor(level=3).compress
+    except ImportError:
+        compressor = 'gzip'
+        compress = gzip.compress
+
+# Save modes as offered in the Ginder preferences
+modes = {
+    'repository':   lambda data: data,
+    'compressed':   compress,
+}
+
+
+class SyntheticBlend:
+    '''Stands in for a .blend file: a header followed by data blocks (block header + payload). Blocks hold vertex
+       coordinates, face indices or mostly empty structs. An edit cycle moves some vertices, tweaks a few structs and
+       now and then adds a block, as modelling in Blender would.'''
+    def __init__(self, size:int, seed:int):
+        self.rng = random.Random(seed)
+        self.blocks = []
+        total = 0
+        while total < size:
+            block = self.new_block()
+            self.blocks.append(block)
+            total += len(block[1])
+
+    def new_block(self) -> tuple[bytes, bytearray, int]:
+        rng = self.rng
+        kind = rng.choice([b'VERT', b'FACE', b'DATA'])
+        count = rng.randrange(1024, 32768)
+        if kind == b'VERT':
+            payload = bytearray(struct.pack(f'<{count}f', *(rng.uniform(-10, 10) for _ in range(count))))
+        elif kind == b'FACE':
+            start = rng.randrange(1 << 20)
+            payload = bytearray(struct.pack(f'<{count}i', *(start + i // 4 + rng.randrange(3) for i in range(count))))
+        else:
+            payload = bytearray(count * 4)
+            for _ in range(count // 64):
+                struct.pack_into('<i', payload, rng.randrange(count) * 4, rng.randrange(1 << 16))
+        return kind, payload, rng.getrandbits(64)
+
+    def edit(self, edits:int):
+        rng = self.rng
+        for _ in range(edits):
+            kind, payload, _ = rng.choice(self.blocks)
+            offset = rng.randrange(0, len(payload) - 64, 4)
+            for i in range(offset, offset + 64, 4):
+                struct.pack_into('<f' if kind == b'VERT' else '<i', payload, i, rng.uniform(-10, 10) if kind == b'VERT' else rng.randrange(1 << 16))
+        if rng.random() < 0.2:
+            self.blocks.insert(rng.randrange(len(self.blocks)), self.new_block())
+
+    def data(self) -> bytes:
+        parts = [b'BLENDER-v404']
+        for kind, payload, address in self.blocks:
+            parts.append(struct.pack('<4siQii', kind, len(payload), address, 0, 1))
+            parts.append(bytes(payload))
+        parts.append(b'ENDB')
+        return b''.join(parts)
+
+
+def dir_size(path:str) -> int:
+    return sum(os.path.getsize(os.path.join(dirpath, filename)) for dirpath, _, filenames in os.walk(path) for filename in filenames)
+
+
+def run_mode(mode:str, args, root:str) -> dict:
+    remote_dir = os.path.join(root, mode, 'remote.git')
+    work_dir = os.path.join(root, mode, 'work')
+    pygit2.init_repository(remote_dir, bare=True)
+    repo = pygit2.init_repository(work_dir, initial_head='main')
+    remote = repo.remotes.create('origin', remote_dir)
+    signature = pygit2.Signature('Ginder Bench', 'bench@example.com')
+
+    scene = SyntheticBlend(args.size * (1 << 20), args.seed)
+    filepath = os.path.join(work_dir, 'scene.blend')
+    commit_time = 0.0
+    pushed = 0
+    file_size = 0
+    for cycle in range(args.cycles):
+        if cycle:
+            scene.edit(args.edits)
+        data = modes[mode](scene.data())
+        file_size = len(data)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+
+        start = time.perf_counter()
+        repo.index.add('scene.blend')
+        repo.index.write()
+        tree = repo.index.write_tree()
+        parents = [] if repo.head_is_unborn else [repo.head.target]
+        repo.create_commit('refs/heads/main', signature, signature, f'Edit {cycle}', tree, parents)
+        commit_time += time.perf_counter() - start
+
+        before = dir_size(os.path.join(remote_dir, 'objects'))
+        remote.push(['refs/heads/main'])
+        pushed += dir_size(os.path.join(remote_dir, 'objects')) - before
+
+    pack_dir = os.path.join(root, mode, 'pack')
+    os.makedirs(pack_dir)
+    repo.pack(pack_dir)
+    return {
+        'file [MB]': file_size / (1 << 20),
+        'commit [ms]': commit_time * 1000 / args.cycles,
+        'pushed [MB]': pushed / (1 << 20),
+        'pack [MB]': dir_size(pack_dir) / (1 << 20),
+    }
+
+
+def report(results:dict, args) -> list:
+    columns = list(next(iter(results.values())))
+    lines = [f'{args.cycles} edit cycles of a {args.size} MB synthetic .blend, {args.edits} edits per cycle, compressed = {compressor}',
+             f'{"mode":<12}' + ''.join(f'{column:>14}' for column in columns)]
+    for mode, result in results.items():
+        lines.append(f'{mode:<12}' + ''.join(f'{result[column]:>14.2f}' for column in columns))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare repository growth of .blend save modes.')
+    parser.add_argument('--cycles', type=int, default=10, help='Number of edit/commit/push cycles (default: 10)')
+    parser.add_argument('--size', type=int, default=20, help='Approximate size of the uncompressed .blend in MB (default: 20)')
+    parser.add_argument('--edits', type=int, default=20, help='Edits per cycle (default: 20)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the synthetic scene')
+    parser.add_argument('--mode', action='append', choices=list(modes), help='Save mode to measure (may be repeated, default: all)')
+    parser.add_argument('--output', default='', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='ginder-bench-pack-')
+    try:
+        results = {mode: run_mode(mode, args, root) for mode in (args.mode or modes)}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    lines = report(results, args)
+    print('\n'.join(lines))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Measures the time Ginder spends on Blender's main thread during startup and on the UI hot paths,
+# outside of Blender (see bpy_stub.py). Exits with status 1 if a phase exceeds its latency budget.
+# Phases without a budget run in worker threads and are reported for information only.
+#
+# Usage:
+#   python bench/bench_startup.py [--budget PHASE=MS ...] [--token TOKEN] [--blendfile PATH] [--output FILE]
+#
+# Example:
+#   python bench/bench_startup.py --budget register=50 --blendfile /path/to/repo/scene.blend
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import bpy_stub
+
+# Default latency budgets in milliseconds. All phases run on Blender's main thread.
+default_budgets = {
+    'import':               100,
+    'icon loads':            20,
+    'prerequisite check':    10,
+    'token validation':      10,
+    'register':             100,
+    'first pulse':           10,
+    'preferences draw':      10,
+    'first menu draw':       10,
+    'menu draw':              5,
+}
+
+
+class PhaseTimer:
+    '''Accumulates the wall-clock time spent in wrapped functions per phase.'''
+    def __init__(self):
+        self.times = {}
+
+    def add(self, phase:str, seconds:float):
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    def measure(self, phase:str, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def wrap(self, phase:str, function):
+        def wrapper(*args, **kwargs):
+            return self.measure(phase, function, *args, **kwargs)
+        return wrapper
+
+
+def parse_budgets(items:list) -> dict:
+    budgets = dict(default_budgets)
+    for item in items or []:
+        phase, _, ms = item.partition('=')
+        if phase not in budgets:
+            raise SystemExit(f'Unknown phase "{phase}". Known phases: {", ".join(budgets)}')
+        budgets[phase] = float(ms)
+    return budgets
+
+
+def run(args) -> PhaseTimer:
+    timer = PhaseTimer()
+    bpy = bpy_stub.install()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    ginder = timer.measure('import', __import__, 'ginder')
+    bpy_stub.enable_addon(bpy, ginder, ginder.id_for_addon, github_token=args.token)
+
+    # Instrument the phases register() goes through
+    bpy_stub.ImagePreviewCollection.load = timer.wrap('icon loads', bpy_stub.ImagePreviewCollection.load)
+    ginder.check_prerequisites = timer.wrap('prerequisite check', ginder.check_prerequisites)
+    token_present = ginder.token_present
+    ginder.token_present = timer.wrap('token validation', token_present)
+    check_token = ginder.check_token
+    def timed_check_token(token):
+        # register() hands the GitHub round trips to a worker thread, only a check on the main thread counts against the budget
+        phase = 'token validation' if threading.current_thread() is threading.main_thread() else 'token check (worker)'
+        return timer.measure(phase, check_token, token)
+    ginder.check_token = timed_check_token
+
+    timer.measure('register', ginder.register)
+
+    # The worker's token validation may still be running. Give it a moment and then process what it
+    # handed over to the main thread, as the UIUpdate timer would do in Blender.
+    time.sleep(args.settle)
+    timer.measure('first pulse', ginder.UIUpdate.pulse)
+    ginder.check_token = check_token
+    ginder.token_present = token_present
+
+    if args.blendfile:
+        bpy.data.filepath = args.blendfile
+        for handler in bpy.app.handlers.load_post:
+            try:
+                handler(args.blendfile)
+            except Exception as ex:
+                print(f'load_post handler failed: {ex}')
+        time.sleep(args.settle)
+        ginder.UIUpdate.pulse()
+
+    prefs = bpy.context.preferences.addons[ginder.id_for_addon].preferences
+    prefs.layout = bpy_stub.Layout()
+    timer.measure('preferences draw', ginder.GinderPreferences.draw, prefs, bpy.context)
+
+    menu = ginder.GinderMenu()
+    menu.layout = bpy_stub.Layout()
+    file_menu = type('FileMenu', (), {'layout': bpy_stub.Layout()})()
+    timer.measure('first menu draw', ginder.draw_ginder_menu, file_menu, bpy.context)
+    timer.measure('first menu draw', ginder.GinderMenu.draw, menu, bpy.context)
+
+    # Subsequent redraws, including the operator polls Blender runs for each menu entry
+    operators = [ginder.CommitToRepoOperator, ginder.PushToRemoteOperator, ginder.PullFromRemoteOperator, ginder.MergeTheirsOperator, ginder.MergeOursOperator]
+    for i in range(args.redraws):
+        start = time.perf_counter()
+        ginder.draw_ginder_menu(file_menu, bpy.context)
+        ginder.GinderMenu.draw(menu, bpy.context)
+        for operator in operators:
+            operator.poll(bpy.context)
+        timer.add('menu draw', (time.perf_counter() - start) / args.redraws)
+
+    ginder.unregister()
+    return timer
+
+
+def report(timer:PhaseTimer, budgets:dict) -> tuple[list, list]:
+    lines = [f'{"phase":<20} {"time [ms]":>10} {"budget [ms]":>12}']
+    exceeded = []
+    for phase in list(budgets) + [phase for phase in timer.times if phase not in budgets]:
+        if phase not in timer.times:
+            continue
+        ms = timer.times[phase] * 1000
+        budget = budgets.get(phase)
+        over = budget is not None and ms > budget
+        if over:
+            exceeded.append(phase)
+        lines.append(f'{phase:<20} {ms:>10.2f} {budget if budget is not None else "-":>12}{"  EXCEEDED" if over else ""}')
+    return lines, exceeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Ginder startup and UI hot-path latency against a bpy stub.')
+    parser.add_argument('--budget', action='append', metavar='PHASE=MS', help='Override the latency budget of a phase (may be repeated)')
+    parser.add_argument('--token', default='', help='GitHub token to validate during startup (default: none, no network access)')
+    parser.add_argument('--blendfile', default='', help='Pretend this .blend file was loaded (runs the load_post handlers)')
+    parser.add_argument('--redraws', type=int, default=20, help='Number of menu redraws to average over')
+    parser.add_argument('--settle', type=float, default=0.5, help='Seconds to wait for background work before drawing')
+    parser.add_argument('--output', default='', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget)
+    timer = run(args)
+    lines, exceeded = report(timer, budgets)
+    print('\n'.join(lines))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    if exceeded:
+        print(f'Latency budget exceeded: {", ".join(exceeded)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Lightweight stand-in for Blender's bpy module. Just enough API surface to register the Ginder add-on
+# and to run its draw() methods outside of Blender. Nothing is drawn: layout calls are only counted.
+
+import os
+import sys
+import tempfile
+import types
+
+
+class Prop:
+    '''Result of a bpy.props.*Property() call. Keeps the keyword arguments (e.g. the default value).'''
+    def __init__(self, kind:str, **kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+
+    def default(self):
+        if 'default' in self.kwargs:
+            return self.kwargs['default']
+        return {'StringProperty': '', 'BoolProperty': False, 'IntProperty': 0, 'FloatProperty': 0.0}.get(self.kind)
+
+
+class Layout:
+    '''Accepts all UILayout calls and attribute assignments. Counts the items drawn.'''
+    items = 0
+
+    def __getattr__(self, name):
+        def item(*args, **kwargs):
+            Layout.items += 1
+            return Layout()
+        return item
+
+
+class Preview:
+    def __init__(self, icon_id:int):
+        self.icon_id = icon_id
+
+
+class ImagePreviewCollection(dict):
+    next_icon_id = 1
+
+    def load(self, name:str, path:str, path_type:str):
+        # Read the file to account for the disk access Blender does when loading an icon
+        with open(path, 'rb') as f:
+            f.read()
+        preview = Preview(ImagePreviewCollection.next_icon_id)
+        ImagePreviewCollection.next_icon_id += 1
+        self[name] = preview
+        return preview
+
+    def close(self):
+        self.clear()
+
+
+class Timers:
+    def __init__(self):
+        self.registered = {}
+
+    def register(self, function, first_interval=0, persistent=False):
+        self.registered[function] = first_interval
+
+    def unregister(self, function):
+        self.registered.pop(function, None)
+
+    def is_registered(self, function):
+        return function in self.registered
+
+
+class Area:
+    def __init__(self, type:str = 'TOPBAR'):
+        self.type = type
+
+    def tag_redraw(self):
+        pass
+
+
+def install(user_dir:str = None) -> types.ModuleType:
+    '''Puts the stub modules into sys.modules. Returns the bpy stub.'''
+    user_dir = user_dir or tempfile.mkdtemp(prefix='ginder_bpy_stub_')
+
+    bpy = types.ModuleType('bpy')
+
+    bpy_types = types.ModuleType('bpy.types')
+    bpy_types.Operator = type('Operator', (), {})
+    bpy_types.Menu = type('Menu', (), {})
+    bpy_types.AddonPreferences = type('AddonPreferences', (), {})
+    bpy_types.PropertyGroup = type('PropertyGroup', (), {})
+    bpy_types.Area = Area
+    bpy_types.TOPBAR_MT_file = type('TOPBAR_MT_file', (), {'prepend': staticmethod(lambda fn: None), 'remove': staticmethod(lambda fn: None)})
+    bpy.types = bpy_types
+
+    bpy_props = types.ModuleType('bpy.props')
+    for kind in ['StringProperty', 'BoolProperty', 'IntProperty', 'FloatProperty', 'EnumProperty', 'CollectionProperty', 'PointerProperty']:
+        setattr(bpy_props, kind, (lambda kind: lambda **kwargs: Prop(kind, **kwargs))(kind))
+    bpy.props = bpy_props
+
+    bpy_app = types.ModuleType('bpy.app')
+    bpy_handlers = types.ModuleType('bpy.app.handlers')
+    bpy_handlers.persistent = lambda fn: fn
+    for name in ['load_pre', 'load_post', 'save_pre', 'save_post', 'depsgraph_update_post']:
+        setattr(bpy_handlers, name, [])
+    bpy_app.handlers = bpy_handlers
+    bpy_app.timers = Timers()
+    bpy_app.binary_path = sys.executable
+    bpy_app.tempdir = tempfile.gettempdir()
+    bpy_app.version = (4, 0, 0)
+    bpy.app = bpy_app
+
+    bpy_utils = types.ModuleType('bpy.utils')
+    bpy_previews = types.ModuleType('bpy.utils.previews')
+    bpy_previews.new = ImagePreviewCollection
+    bpy_previews.remove = lambda pcoll: pcoll.close()
+    bpy_utils.previews = bpy_previews
+    bpy_utils.register_class = lambda cls: None
+    bpy_utils.unregister_class = lambda cls: None
+
+    def user_resource(resource_type:str, path:str = '', create:bool = False) -> str:
+        result = os.path.join(user_dir, resource_type.lower(), path)
+        if create:
+            os.makedirs(result, exist_ok=True)
+        return result
+    bpy_utils.user_resource = user_resource
+    bpy.utils = bpy_utils
+
+    bpy_path = types.ModuleType('bpy.path')
+    bpy_path.abspath = lambda path, start=None, library=None: os.path.abspath(path[2:] if path.startswith('//') else path)
+    bpy_path.basename = lambda path: os.path.basename(path[2:] if path.startswith('//') else path)
+    bpy.path = bpy_path
+
+    bpy.data = types.SimpleNamespace(is_dirty=False, filepath='', libraries=[], images=[], sounds=[], fonts=[], movieclips=[], cache_files=[], volumes=[],
+                                     window_managers={'WinMan': types.SimpleNamespace()})
+    bpy.context = types.SimpleNamespace(
+        window_manager=types.SimpleNamespace(windows=[], popup_menu=lambda draw, title='', icon='': None),
+        preferences=types.SimpleNamespace(addons={}, use_preferences_save=False, active_section=''),
+        area=Area(),
+        window=None,
+        object=None,
+        blend_data=bpy.data)
+    bpy.ops = types.SimpleNamespace()
+
+    bpy_extras = types.ModuleType('bpy_extras')
+    io_utils = types.ModuleType('bpy_extras.io_utils')
+    io_utils.ExportHelper = type('ExportHelper', (), {})
+    bpy_extras.io_utils = io_utils
+
+    sys.modules.update({
+        'bpy': bpy,
+        'bpy.types': bpy_types,
+        'bpy.props': bpy_props,
+        'bpy.app': bpy_app,
+        'bpy.app.handlers': bpy_handlers,
+        'bpy.utils': bpy_utils,
+        'bpy.utils.previews': bpy_previews,
+        'bpy.path': bpy_path,
+        'bpy_extras': bpy_extras,
+        'bpy_extras.io_utils': io_utils,
+    })
+    return bpy
+
+
+def enable_addon(bpy, module, addon_name:str, **preferences):
+    '''Makes bpy.context.preferences.addons[addon_name].preferences an instance of the add-on's preferences class with
+       all properties set to their defaults (or to the values passed in preferences).'''
+    prefs_cls = next(cls for cls in vars(module).values() if isinstance(cls, type) and issubclass(cls, bpy.types.AddonPreferences) and cls is not bpy.types.AddonPreferences)
+    prefs = prefs_cls()
+    for name, prop in getattr(prefs_cls, '__annotations__', {}).items():
+        if isinstance(prop, Prop):
+            setattr(prefs, name, prop.default())
+    for name, value in preferences.items():
+        setattr(prefs, name, value)
+    bpy.context.preferences.addons[addon_name] = types.SimpleNamespace(preferences=prefs)
+    return prefs
@@ -0,0 +1,128 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Checks "Snapshot on Save" outside of Blender (see bpy_stub.py): a burst of saves of a .blend file in a (sub folder
+# of a) repo must end up as exactly one commit on refs/ginder/snapshots holding the last saved content, without
+# touching HEAD or the index, and the next commit must squash it. Exits with status 1 if a check fails.
+#
+# Usage:
+#   python bench/check_snapshots.py [--saves N]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+import bpy_stub
+
+
+def wait_for_publish(ginder, timeout:float = 10.0):
+    deadline = time.time() + timeout
+    while ginder.GinderPublish.busy() and time.time() < deadline:
+        time.sleep(0.02)
+    ginder.UIUpdate.pulse()
+
+
+def save(bpy, ginder, filepath:str, content:str):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    for handler in bpy.app.handlers.save_post:
+        handler(filepath)
+
+
+def run(args, root:str) -> list:
+    import pygit2
+    bpy = bpy_stub.install()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import ginder
+    bpy_stub.enable_addon(bpy, ginder, ginder.id_for_addon, snapshot_on_save=True, use_lfs=False)
+    ginder.GinderState.install_post_save_handler()
+    ginder.UIUpdate.start_pulse()
+
+    work_dir = os.path.join(root, 'work')
+    os.makedirs(os.path.join(work_dir, 'shots'))
+    filepath = os.path.join(work_dir, 'shots', 'scene.blend')
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('initial')
+    repo = pygit2.init_repository(work_dir, initial_head='main')
+    signature = pygit2.Signature('Ginder Check', 'check@example.com')
+    repo.index.add_all()
+    repo.index.write()
+    head = repo.create_commit('refs/heads/main', signature, signature, 'Initial', repo.index.write_tree(), [])
+
+    # Attach as loading the file would, but without GitHub
+    ginder.GinderGit.github_user = types.SimpleNamespace(name='Ginder Check', login='check')
+    ginder.GinderGit.github_useremail = 'check@example.com'
+    bpy.data.filepath = filepath
+    ginder.GinderGit.attach_local(ginder.GinderGit.attach_generation, pygit2.discover_repository(os.path.dirname(filepath)), 'work', None, None)
+
+    failures = []
+    for i in range(args.saves):
+        save(bpy, ginder, filepath, f'save {i}')
+    if not bpy.app.timers.is_registered(ginder.GinderSnapshots.flush):
+        failures.append('saving did not schedule a snapshot')
+    else:
+        # The debounce timer fires
+        bpy.app.timers.unregister(ginder.GinderSnapshots.flush)
+        ginder.GinderSnapshots.flush()
+        wait_for_publish(ginder)
+
+    repo = pygit2.Repository(work_dir)
+    ref = repo.references.get(ginder.GinderSnapshots.ref)
+    if not ref:
+        failures.append(f'no commit on {ginder.GinderSnapshots.ref}')
+    else:
+        snapshot = ref.peel(pygit2.Commit)
+        if [parent.id for parent in snapshot.parents] != [head]:
+            failures.append(f'{args.saves} saves did not collapse into one snapshot')
+        if snapshot.tree['shots/scene.blend'].data != f'save {args.saves - 1}'.encode():
+            failures.append('the snapshot does not hold the last saved content')
+    if repo.head.target != head:
+        failures.append('recording a snapshot moved HEAD')
+    if 'shots/scene.blend' in repo.status() and repo.status()['shots/scene.blend'] & pygit2.enums.FileStatus.INDEX_MODIFIED:
+        failures.append('recording a snapshot changed the index')
+
+    ginder.GinderPublish.submit(ginder.PublishJob('Edits', ['shots/scene.blend'], False))
+    wait_for_publish(ginder)
+    repo = pygit2.Repository(work_dir)
+    if repo.references.get(ginder.GinderSnapshots.ref):
+        failures.append('committing did not drop the snapshots')
+    if '(1 snapshot)' not in repo.head.peel(pygit2.Commit).message:
+        failures.append('committing did not squash the snapshot')
+
+    ginder.GinderWatch.stop()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that saves are recorded as snapshots and squashed on commit.')
+    parser.add_argument('--saves', type=int, default=5, help='Number of saves in the burst (default: 5)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='ginder-check-snapshots-')
+    try:
+        failures = run(args, root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    for failure in failures:
+        print(f'FAILED: {failure}')
+    if failures:
+        sys.exit(1)
+    print('Snapshots OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Minimal Git LFS server (batch API, basic transfers) keeping the objects in a local directory.
+# Stands in for GitHub's LFS server when testing Ginder's LFS support against a local bare repo.
+#
+# Usage:
+#   python bench/lfs_server.py [--port PORT] [--storage DIR]
+#
+# Point a repository at it with:
+#   git -C /path/to/repo config lfs.url http://localhost:8089/
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+media_type = 'application/vnd.git-lfs+json'
+oid_pattern = re.compile(r'^[0-9a-f]{64}$')
+
+
+class LfsHandler(BaseHTTPRequestHandler):
+    storage: str = None
+
+    def object_path(self, oid:str) -> str:
+        return os.path.join(self.storage, oid[0:2], oid[2:4], oid)
+
+    def object_oid(self) -> str:
+        oid = self.path.rstrip('/').rsplit('/', 1)[-1]
+        return oid if '/objects/' in self.path and oid_pattern.match(oid) else None
+
+    def send_json(self, status:int, data:dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', media_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.endswith('/objects/batch'):
+            return self.send_json(404, {'message': 'Not found'})
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        base = f'http://{self.headers["Host"]}{self.path[:-len("/batch")]}'
+        objects = []
+        for object in request['objects']:
+            oid, size = object['oid'], object['size']
+            present = os.path.exists(self.object_path(oid))
+            response = {'oid': oid, 'size': size, 'authenticated': True}
+            if request['operation'] == 'download':
+                if present:
+                    response['actions'] = {'download': {'href': f'{base}/{oid}'}}
+                else:
+                    response['error'] = {'code': 404, 'message': 'Object does not exist'}
+            elif not present:
+                response['actions'] = {'upload': {'href': f'{base}/{oid}'}}
+            objects.append(response)
+        self.send_json(200, {'transfer': 'basic', 'objects': objects})
+
+    def do_GET(self):
+        oid = self.object_oid()
+        if not oid or not os.path.exists(self.object_path(oid)):
+            return self.send_json(404, {'message': 'Object does not exist'})
+        with open(self.object_path(oid), 'rb') as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        oid = self.object_oid()
+        if not oid:
+            return self.send_json(404, {'message': 'Not found'})
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        if hashlib.sha256(data).hexdigest() != oid:
+            return self.send_json(422, {'message': 'Content does not match oid'})
+        path = self.object_path(oid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Git LFS objects from a local directory.')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on (default: 8089)')
+    parser.add_argument('--storage', default='lfs-storage', help='Directory holding the objects (default: ./lfs-storage)')
+    args = parser.parse_args()
+
+    LfsHandler.storage = os.path.abspath(args.storage)
+    os.makedirs(LfsHandler.storage, exist_ok=True)
+    server = ThreadingHTTPServer(('localhost', args.port), LfsHandler)
+    print(f'Git LFS stand-in serving {LfsHandler.storage} on http://localhost:{args.port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
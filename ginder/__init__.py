@@ -12,26 +12,31 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import json
+import hashlib
 from urllib.parse import urlparse
-from urllib.request import urlretrieve
 import bpy
 from bpy.app.handlers import persistent
 import os
 import sys
 import queue
-import ensurepip
 import subprocess
 import threading
 import functools
-import requests
+import contextlib
+import importlib.util
 import atexit
 import time
 import platform
 import urllib
 import string
 import random
+import select
+import struct
+import ctypes
+import ctypes.util
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from enum import Enum
+from typing import NamedTuple
 
 
 # ExportHelper is a helper class, defines filename and
@@ -70,6 +75,11 @@ id_for_push_to_remote_operator = "ginder.push_to_remote"
 id_for_pull_from_remote_operator = "ginder.pull_from_remote"
 id_for_merge_theirs_operator = "ginder.merge_theirs"
 id_for_merge_ours_operator = "ginder.merge_ours"
+id_for_build_wheelhouse_operator = "ginder.build_wheelhouse"
+id_for_sparse_checkout_operator = "ginder.sparse_checkout"
+id_for_cancel_transfer_operator = "ginder.cancel_transfer"
+id_for_publish_operator = "ginder.publish"
+id_for_sparse_add_folder_operator = "ginder.sparse_add_folder"
 
 #######################################################################################################
 #
@@ -78,8 +88,9 @@ id_for_merge_ours_operator = "ginder.merge_ours"
 #######################################################################################################
 
 def connected_to_internet(url='https://www.example.com/', timeout=10):
+    import requests
     try:
-        _ = requests.head(url, timeout=timeout)
+        _ = GinderGitHub.session().head(url, timeout=timeout)
         return True
     except requests.ConnectionError:
         pass
@@ -91,6 +102,25 @@ def get_path():
     return os.path.dirname(os.path.realpath(__file__))
 
 
+# get (and create) Ginder's folder in Blender's user config directory, e.g. ~/.config/blender/4.0/config/ginder
+def get_config_path():
+    return bpy.utils.user_resource('CONFIG', path=id_for_addon, create=True)
+
+
+# get (and create) Ginder's folder in the platform's user cache directory. Contents may be deleted at any time.
+def get_cache_path():
+    match platform.system():
+        case "Windows":
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/AppData/Local')
+        case "Darwin":
+            base = os.path.expanduser('~/Library/Caches')
+        case _:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path = os.path.join(base, id_for_addon)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 def report_error(header: str, msg: str):
     ShowMessageBox(msg, header, 'ERROR')
     print(header + ": " + msg)
@@ -103,6 +133,17 @@ def ShowMessageBox(message = "", title = "Message Box", icon = 'INFO'):
 
     bpy.context.window_manager.popup_menu(draw, title = title, icon = icon)
 
+
+# Must be called from the main thread (e.g. through run_in_main_thread)
+def tag_redraw_areas(area_types = ('TOPBAR', 'PREFERENCES')):
+    wm = bpy.context.window_manager
+    if not wm:
+        return
+    for window in wm.windows:
+        for area in window.screen.areas:
+            if area.type in area_types:
+                area.tag_redraw()
+
 #######################################################################################################
 #
 #  ADD-ON STATE AND PREREQUISITES MANAGEMENT
@@ -111,25 +152,19 @@ def ShowMessageBox(message = "", title = "Message Box", icon = 'INFO'):
 
 ginder_prerequisites = {}
 
+# Module names as imported (not as pip-installed)
+ginder_prerequisite_modules = ['pygit2', 'github', 'requests_oauthlib']
+
 def check_prerequisites():
+    # Only look the modules up without importing them. PyGithub alone would add a large dependency tree to register().
+    # The modules are imported on first real use (mostly from worker threads).
     global ginder_prerequisites
-    ginder_prerequisites = {'pygit2':False, 'github':False, 'requests_oauthlib':False}
-    try:
-        import pygit2
-        ginder_prerequisites['pygit2'] = True
-    except:
-        ginder_prerequisites['pygit2'] = False
-    try:
-        import github
-        ginder_prerequisites['github'] = True
-    except:
-        ginder_prerequisites['github'] = False
-    try:
-        import requests_oauthlib
-        ginder_prerequisites['requests_oauthlib'] = True
-    except:
-        ginder_prerequisites['requests_oauthlib'] = False
-  
+    ginder_prerequisites = {}
+    for module in ginder_prerequisite_modules:
+        try:
+            ginder_prerequisites[module] = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            ginder_prerequisites[module] = False
 
 
 def token_present() -> bool:
@@ -142,35 +177,33 @@ def token_present() -> bool:
     
 def check_token(token: str):
     # Try to connnect to GitHub using the token passed to us
+    # User profile and emails hardly ever change: use conditional requests (a 304 costs no rate limit).
     try:
-        import github
-        auth=github.Auth.Token(token=token)
-        g = github.Github(auth=auth)
-        user = g.get_user()
+        from github.AuthenticatedUser import AuthenticatedUser
+        g = GinderGitHub.client(token)
+        user_data = GinderHttpCache.get_json(f'{GinderGitHub.api_url}/user', token)
+        user = g.create_from_raw_data(AuthenticatedUser, user_data)
         user_name = user.name
     except:
         GinderState.state = GinderState.PREREQ_INSTALLED
         return
         
     try:
-        useremail = next(item for item in user.get_emails() if item.primary == True).email
+        emails = GinderHttpCache.get_json(f'{GinderGitHub.api_url}/user/emails', token)
+        useremail = next(item for item in emails if item['primary'] == True)['email']
     except:
         useremail = "Noreply"
-    g.close()
 
     # We're still here: notify the main thread
     run_in_main_thread(functools.partial(GinderGit.set_user,  user, useremail))
     GinderState.state = GinderState.GITHUB_REGISTERED
+    run_in_main_thread(GinderGit.signed_in)
 
     # Try to load the user avatar (if not already loaded during this session)
     if not 'the_avatar_icon' in preview_collections['main']:
-        avatar_download_url = urlparse(user.avatar_url)
-        _, avatar_ext = os.path.splitext(avatar_download_url.path)
-        avatar_local_dir = os.path.join(os.path.dirname(__file__), "icons", f"avatar{avatar_ext}")
-
         try:
-            urlretrieve(user.avatar_url, avatar_local_dir)
-            run_in_main_thread(lambda:preview_collections['main'].load('the_avatar_icon', avatar_local_dir, 'IMAGE'))
+            avatar_path = GinderAvatar.fetch(user.avatar_url)
+            run_in_main_thread(functools.partial(GinderAvatar.load, avatar_path))
         except Exception:
             run_in_main_thread(lambda:report_error('ERROR', f'Could not load GitHub avatar from: {user.avatar_url}'))
             pass
@@ -264,12 +297,18 @@ class GinderState:
         GinderGit.check_and_open_repo(blendfile)
 
     @staticmethod
-    def install_post_load_handler():
+    @persistent
+    def post_save_handler(blendfile):
+        GinderFetch.note_activity()
+        GinderDepIndex.record_current()
+        GinderSnapshots.saved()
+        GinderStatus.invalidate()
+
+    @staticmethod
+    def install_handler(fn_list, fn):
         # Perform 
-        #  ´´´bpy.app.handlers.load_post.append(GinderState.post_load_handler)´´´
+        #  ´´´fn_list.append(fn)´´´
         # once and only once
-        fn_list = bpy.app.handlers.load_post
-        fn = GinderState.post_load_handler
         fn_name = fn.__name__
         fn_module = fn.__module__
         for i in range(len(fn_list) - 1, -1, -1):
@@ -277,6 +316,315 @@ class GinderState:
                 del fn_list[i]
         fn_list.append(fn)
 
+    @staticmethod
+    def install_post_load_handler():
+        GinderState.install_handler(bpy.app.handlers.load_post, GinderState.post_load_handler)
+
+    @staticmethod
+    def install_post_save_handler():
+        GinderState.install_handler(bpy.app.handlers.save_post, GinderState.post_save_handler)
+
+
+#######################################################################################################
+#
+#  SHARED GitHub CLIENT
+#
+#######################################################################################################
+
+class GinderGitHub:
+    '''One long-lived, thread-safe connection pool for all GitHub traffic of the add-on: a PyGithub client for the
+       object API and a requests.Session for the REST endpoints PyGithub lacks. Both keep connections alive, so
+       only the first call pays for the TCP and TLS handshakes. Call shutdown() when the add-on is unregistered.
+    '''
+    api_url: str = 'https://api.github.com'
+    api_version: str = '2022-11-28'
+    timeout: float = 15.0
+    retries: int = 3
+    pool_size: int = 8
+
+    http_session = None     # requests.Session
+    github_client = None    # github.Github
+    client_token: str = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def session():
+        '''Returns the shared requests.Session, retrying idempotent requests on connection errors and 5xx responses.'''
+        with GinderGitHub.lock:
+            if not GinderGitHub.http_session:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retry = Retry(total=GinderGitHub.retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset(['HEAD', 'GET', 'OPTIONS']))
+                adapter = HTTPAdapter(pool_connections=GinderGitHub.pool_size, pool_maxsize=GinderGitHub.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                GinderGitHub.http_session = session
+            return GinderGitHub.http_session
+
+    @staticmethod
+    def headers(token:str) -> dict:
+        return {
+            "Accept"                :  "application/vnd.github+json",
+            "Authorization"         : f"Bearer {token}",
+            "X-GitHub-Api-Version"  :  GinderGitHub.api_version
+        }
+
+    @staticmethod
+    def request(method:str, url:str, token:str, **kwargs):
+        '''Performs a GitHub REST call on the shared session. Returns the requests.Response.'''
+        headers = GinderGitHub.headers(token)
+        headers.update(kwargs.pop('headers', {}))
+        kwargs.setdefault('timeout', GinderGitHub.timeout)
+        return GinderGitHub.session().request(method, url, headers=headers, **kwargs)
+
+    @staticmethod
+    def client(token:str):
+        '''Returns the shared PyGithub client for token. A new client is only created when the token changes.'''
+        with GinderGitHub.lock:
+            if not GinderGitHub.github_client or GinderGitHub.client_token != token:
+                from github import Github
+                from github import Auth
+                if GinderGitHub.github_client:
+                    GinderGitHub.github_client.close()
+                # Setting pool_size makes PyGithub's requester thread-safe
+                GinderGitHub.github_client = Github(auth=Auth.Token(token), timeout=int(GinderGitHub.timeout), retry=GinderGitHub.retries, pool_size=GinderGitHub.pool_size)
+                GinderGitHub.client_token = token
+            return GinderGitHub.github_client
+
+    @staticmethod
+    def shutdown():
+        with GinderGitHub.lock:
+            if GinderGitHub.github_client:
+                GinderGitHub.github_client.close()
+            if GinderGitHub.http_session:
+                GinderGitHub.http_session.close()
+            GinderGitHub.github_client = None
+            GinderGitHub.client_token = None
+            GinderGitHub.http_session = None
+
+
+#######################################################################################################
+#
+#  CONDITIONAL REQUEST CACHE FOR GitHub REST METADATA
+#
+#######################################################################################################
+
+class GinderHttpCache:
+    '''Persistent cache for GitHub REST GET requests. Stores ETag and Last-Modified of each response in Blender's
+       user config directory and sends conditional requests (If-None-Match / If-Modified-Since). A 304 answer
+       costs neither rate limit nor body transfer and is served from the cache.
+    '''
+    filename: str = 'http_cache.json'
+    entries: dict = None    # key -> {'etag': str, 'last_modified': str, 'body': json}
+    lock = threading.Lock()
+
+    @staticmethod
+    def path() -> str:
+        return os.path.join(get_config_path(), GinderHttpCache.filename)
+
+    @staticmethod
+    def key(url:str, token:str) -> str:
+        # Different tokens (users) may see different content. Never store the token itself.
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16] + ' ' + url
+
+    @staticmethod
+    def load():
+        if GinderHttpCache.entries is not None:
+            return
+        try:
+            with open(GinderHttpCache.path(), 'r', encoding='utf-8') as f:
+                GinderHttpCache.entries = json.load(f)
+        except (OSError, ValueError):
+            GinderHttpCache.entries = {}
+
+    @staticmethod
+    def save():
+        path = GinderHttpCache.path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(GinderHttpCache.entries, f)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def get_json(url:str, token:str):
+        '''GETs url and returns the decoded JSON body, from the cache if the server answers 304 Not Modified.
+           Raises an exception on any other non-2xx answer.'''
+        key = GinderHttpCache.key(url, token)
+        with GinderHttpCache.lock:
+            GinderHttpCache.load()
+            entry = GinderHttpCache.entries.get(key)
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        res = GinderGitHub.request('GET', url, token, headers=headers)
+
+        if res.status_code == 304 and entry:
+            return entry['body']
+        if not (200 <= res.status_code and res.status_code < 300):
+            raise Exception(f'GET {url} failed with status {res.status_code}')
+
+        body = res.json()
+        if res.headers.get('ETag') or res.headers.get('Last-Modified'):
+            with GinderHttpCache.lock:
+                GinderHttpCache.entries[key] = {'etag': res.headers.get('ETag'), 'last_modified': res.headers.get('Last-Modified'), 'body': body}
+                try:
+                    GinderHttpCache.save()
+                except OSError as ex:
+                    print(f'Ginder: could not write {GinderHttpCache.path()}: {str(ex)}')
+        return body
+
+    @staticmethod
+    def forget(token:str):
+        '''Removes all entries requested with token, e.g. when the user resets the GitHub registration.'''
+        prefix = GinderHttpCache.key('', token)
+        with GinderHttpCache.lock:
+            GinderHttpCache.load()
+            GinderHttpCache.entries = {key: entry for key, entry in GinderHttpCache.entries.items() if not key.startswith(prefix)}
+            try:
+                GinderHttpCache.save()
+            except OSError:
+                pass
+
+
+#######################################################################################################
+#
+#  PERSISTENT REPOSITORY METADATA
+#
+#######################################################################################################
+
+class GinderRepoMeta:
+    '''Small persistent store of what Ginder learned about each remote repo, keyed by the remote URL: owner, repo name,
+       GitHub-Pages URL, default branch, last known remote head and the raw GitHub repository data. Lets
+       check_and_open_repo() populate the menu from local data while the refresh runs in the background.
+    '''
+    filename: str = 'repo_meta.json'
+    entries: dict = None    # remote url -> {'owner', 'name', 'pages_url', 'default_branch', 'remote_head', 'repo_data', 'updated'}
+    lock = threading.Lock()
+
+    @staticmethod
+    def path() -> str:
+        return os.path.join(get_config_path(), GinderRepoMeta.filename)
+
+    @staticmethod
+    def load():
+        if GinderRepoMeta.entries is not None:
+            return
+        try:
+            with open(GinderRepoMeta.path(), 'r', encoding='utf-8') as f:
+                GinderRepoMeta.entries = json.load(f)
+        except (OSError, ValueError):
+            GinderRepoMeta.entries = {}
+
+    @staticmethod
+    def lookup(remote_url:str) -> dict:
+        with GinderRepoMeta.lock:
+            GinderRepoMeta.load()
+            entry = GinderRepoMeta.entries.get(remote_url)
+            return dict(entry) if entry else None
+
+    @staticmethod
+    def update(remote_url:str, **fields):
+        '''Merges fields into the entry for remote_url and writes the store if anything changed.'''
+        with GinderRepoMeta.lock:
+            GinderRepoMeta.load()
+            entry = GinderRepoMeta.entries.setdefault(remote_url, {})
+            if all(entry.get(key) == value for key, value in fields.items()):
+                return
+            entry.update(fields)
+            entry['updated'] = time.time()
+            path = GinderRepoMeta.path()
+            try:
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(GinderRepoMeta.entries, f)
+                os.replace(path + '.tmp', path)
+            except OSError as ex:
+                print(f'Ginder: could not write {path}: {str(ex)}')
+
+
+#######################################################################################################
+#
+#  AVATAR CACHE
+#
+#######################################################################################################
+
+class GinderAvatar:
+    '''Content-addressed cache for GitHub avatar images in the user cache directory. Images are stored under the
+       SHA-256 of their content and revalidated with conditional GETs, so an unchanged avatar is never downloaded twice.
+    '''
+    size: int = 64          # Icon size requested from GitHub (?s=64)
+    index_name: str = 'avatars.json'
+    extensions = {'image/png': '.png', 'image/jpeg': '.jpg', 'image/gif': '.gif'}
+    lock = threading.Lock()
+
+    @staticmethod
+    def sized_url(avatar_url:str) -> str:
+        url = urlparse(avatar_url)
+        query = urllib.parse.parse_qs(url.query)
+        query['s'] = [str(GinderAvatar.size)]
+        return url._replace(query=urllib.parse.urlencode(query, doseq=True)).geturl()
+
+    @staticmethod
+    def fetch(avatar_url:str) -> str:
+        '''Returns the path of the cached avatar image for avatar_url, downloading it only if it changed.
+           Performs network traffic. Do not call from the main thread.'''
+        cache_dir = os.path.join(get_cache_path(), 'avatars')
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path = os.path.join(cache_dir, GinderAvatar.index_name)
+        url = GinderAvatar.sized_url(avatar_url)
+
+        with GinderAvatar.lock:
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+        entry = index.get(url)
+        cached_path = os.path.join(cache_dir, entry['file']) if entry else None
+        if cached_path and not os.path.isfile(cached_path):
+            entry, cached_path = None, None
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            # Avatars are public. Do not send the GitHub token to the avatar host.
+            res = GinderGitHub.session().get(url, headers=headers, timeout=GinderGitHub.timeout)
+        except Exception:
+            if cached_path:
+                return cached_path  # Offline: the last known avatar is better than none
+            raise
+        if res.status_code == 304 and cached_path:
+            return cached_path
+        res.raise_for_status()
+
+        content_type = res.headers.get('Content-Type', '').split(';')[0].strip()
+        filename = hashlib.sha256(res.content).hexdigest() + GinderAvatar.extensions.get(content_type, '.png')
+        path = os.path.join(cache_dir, filename)
+        if not os.path.isfile(path):
+            with open(path + '.tmp', 'wb') as f:
+                f.write(res.content)
+            os.replace(path + '.tmp', path)
+
+        with GinderAvatar.lock:
+            index[url] = {'etag': res.headers.get('ETag'), 'last_modified': res.headers.get('Last-Modified'), 'file': filename}
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(index_path + '.tmp', index_path)
+        return path
+
+    @staticmethod
+    def load(path:str):
+        '''Loads the avatar image into the main preview collection. Must run in the main thread.'''
+        pcoll = preview_collections.get('main')
+        if pcoll is not None and not 'the_avatar_icon' in pcoll:
+            pcoll.load('the_avatar_icon', path, 'IMAGE')
+
 
 #######################################################################################################
 #
@@ -287,7 +635,9 @@ class GinderState:
 class GinderGit:
     github_user = None
     github_useremail: str = None # Must be set by user
-    repo_dir:str = None
+    repo_dir:str = None     # The .git directory as returned by pygit2.discover_repository()
+    work_dir:str = None     # The working tree (without trailing separator). Repo-relative paths are relative to it
+    git_dirs:dict = {}      # working tree -> git dir, see git_dir()
     github_repo = None # This is the remote presentation repo (origin) as a PyGithub-typedobject
     remote_repo = None # This is the remote presentation repo (origin) as a pygit2-typed object (https://www.pygit2.org/remotes.html#pygit2.Remote)
     local_repo = None  # This is the local presentation repo (clone of origin) as a pygit2-typed object
@@ -295,18 +645,36 @@ class GinderGit:
     remote_username: str = None   # Probably the same as github_user.login but not necessarily
     remote_reponame: str = None 
     githubpages_url: str = None
-    last_fetch_time:float = 0.0
-    fetch_period:float = 15.0
+    default_branch: str = None    # of the remote repo, as reported by GitHub
+    unshallow_depth: int = 2147483647   # libgit2's GIT_FETCH_DEPTH_UNSHALLOW: fetch the history a shallow clone is missing
+
+    ATTACH_NONE = 0         # No repo found for the current file
+    ATTACH_CONNECTING = 1   # check_and_open_repo() is still working in the background
+    ATTACH_DONE = 2
+    ATTACH_OFFLINE = 3      # Local repo attached, but GitHub could not be reached
+    ATTACH_SIGNED_OUT = 4   # Local repo attached, GitHub not asked: there is no token
+    attach_state: int = ATTACH_NONE
+    attach_generation: int = 0
 
     @staticmethod
     def set_user(user, useremail):
         GinderGit.github_user = user
         GinderGit.github_useremail = useremail
 
+    @staticmethod
+    def signed_in():
+        '''Main thread. Attaches the open file again if the GitHub part was skipped for lack of a token.'''
+        if GinderGit.attach_state == GinderGit.ATTACH_SIGNED_OUT and bpy.data.filepath:
+            GinderGit.check_and_open_repo(bpy.data.filepath)
+
     @staticmethod
     def check_and_open_repo(filepath):
+        '''Attaches to the repo containing filepath (if any). Returns immediately, the work is done by attach_repo() in
+           a background job: local discovery first, remote metadata from GitHub and the fetch later. Until the job
+           is done, attach_state is ATTACH_CONNECTING.'''
         # Reset all repo-related settings
         GinderGit.repo_dir = None
+        GinderGit.work_dir = None
         GinderGit.github_repo = None
         GinderGit.remote_repo = None
         GinderGit.local_repo = None
@@ -314,46 +682,153 @@ class GinderGit:
         GinderGit.remote_username = None
         GinderGit.remote_reponame = None 
         GinderGit.githubpages_url = None
+        GinderGit.default_branch = None
+        GinderGit.attach_state = GinderGit.ATTACH_NONE
+        GinderGit.attach_generation += 1
+        GinderFetch.reset()
+        GinderWatch.stop()
                 
         # Check if we can safely perform
         if not GinderState.pygit2_present():
             raise Exception('check_for_repo() called without prerequisites installed.')
         if not filepath:
             raise Exception('check_for_repo() called without filepath specified.')
-        import pygit2
 
-        # Try to find a local git repo along the path
-        curdir = os.path.dirname(filepath)
-        GinderGit.repo_dir = pygit2.discover_repository(curdir) # yields something like "C:/Develop/REPONAME/.git/"
-        if not GinderGit.repo_dir:
-            return False
-        GinderGit.repo_dir.replace('\\', '/')
-        GinderGit.local_repo = pygit2.Repository(GinderGit.repo_dir)
-        pieces = GinderGit.repo_dir.split('/')
-        GinderGit.local_reponame = pieces[-3]
-
-        # Check if there is a remote (the 'origin')
-        GinderGit.remote_repo = GinderGit.local_repo.remotes[0]
-        urlstr = GinderGit.remote_repo.url
-        url = urllib.parse.urlparse(urlstr)
-        pieces = url.path.split('/')
-        GinderGit.remote_username = pieces[-2]
-        reponame = pieces[-1]
-        GinderGit.remote_reponame = reponame.split('.')[0]
-
-        # Try to connect to the remote on GitHub
-        from github import Github
-        from github import Auth
-        auth=Auth.Token(GinderPreferences.get_github_token())
-        g = Github(auth=auth)
-        GinderGit.github_repo = g.get_repo(f'{GinderGit.remote_username}/{GinderGit.remote_reponame}')
-        GinderGit.get_github_page_url()
-        g.close()
-
-        # Fetch any pending changes
-        GinderGit.refetch()
+        GinderGit.attach_state = GinderGit.ATTACH_CONNECTING
+        attach_thread = threading.Thread(target=GinderGit.attach_repo, args=(filepath, GinderGit.attach_generation, GinderPreferences.get_github_token()), daemon=True)
+        attach_thread.start()
         return True
 
+    @staticmethod
+    def attach_repo(filepath:str, generation:int, token:str):
+        '''Background part of check_and_open_repo(). Results are handed to the main thread stage by stage.'''
+        import pygit2
+
+        # Stage 1: Try to find a local git repo along the path
+        try:
+            curdir = os.path.dirname(filepath)
+            repo_dir = pygit2.discover_repository(curdir) # yields something like "C:/Develop/REPONAME/.git/"
+            if not repo_dir:
+                run_in_main_thread(functools.partial(GinderGit.attach_done, generation, GinderGit.ATTACH_NONE))
+                return
+            repo_dir = repo_dir.replace('\\', '/')
+            local_reponame = repo_dir.split('/')[-3]
+
+            # Check if there is a remote (the 'origin')
+            remote_url, remote_username, remote_reponame = None, None, None
+            remotes = pygit2.Repository(repo_dir).remotes
+            if len(remotes) > 0:
+                remote_url = remotes[0].url
+                url = urllib.parse.urlparse(remote_url)
+                pieces = url.path.split('/')
+                remote_username = pieces[-2]
+                remote_reponame = pieces[-1].split('.')[0]
+        except Exception as ex:
+            print(f'Ginder: could not open repository for {filepath}: {str(ex)}')
+            run_in_main_thread(functools.partial(GinderGit.attach_done, generation, GinderGit.ATTACH_NONE))
+            return
+
+        # Populate everything we knew about the remote the last time from the local metadata store
+        meta = GinderRepoMeta.lookup(remote_url) if remote_url else None
+        github_repo = GinderGit.github_repo_from_data(meta.get('repo_data'), token) if meta else None
+        run_in_main_thread(functools.partial(GinderGit.attach_local, generation, repo_dir, local_reponame, remote_username, remote_reponame, meta, github_repo))
+        if not remote_reponame:
+            run_in_main_thread(functools.partial(GinderGit.attach_done, generation, GinderGit.ATTACH_DONE))
+            return
+
+        if not token:
+            run_in_main_thread(functools.partial(GinderGit.attach_done, generation, GinderGit.ATTACH_SIGNED_OUT))
+            return
+
+        # Stage 2: Refresh the metadata from GitHub (conditional requests, mostly answered with 304)
+        github_repo, githubpages_url, default_branch = None, None, None
+        try:
+            repo_data = GinderHttpCache.get_json(f'{GinderGitHub.api_url}/repos/{remote_username}/{remote_reponame}', token)
+            github_repo = GinderGit.github_repo_from_data(repo_data, token)
+            default_branch = repo_data.get('default_branch')
+            try:
+                githubpages_url = GinderGit.get_github_page_url(remote_username, remote_reponame, token)
+            except Exception as ex:
+                # Keep the last known URL: the lookup failing does not mean the repo has no Pages anymore
+                githubpages_url = meta.get('pages_url') if meta else None
+                print(f'Ginder: {str(ex)}')
+            GinderRepoMeta.update(remote_url, owner=remote_username, name=remote_reponame, pages_url=githubpages_url, default_branch=default_branch, repo_data=repo_data)
+        except Exception as ex:
+            print(f'Ginder: could not retrieve GitHub data for {remote_username}/{remote_reponame}: {str(ex)}')
+
+        run_in_main_thread(functools.partial(GinderGit.attach_remote, generation, github_repo, githubpages_url, default_branch))
+
+    @staticmethod
+    def git_dir(work_dir:str) -> str:
+        '''The git dir of a working tree as libgit2 resolves it. <work_dir>/.git may be a file pointing elsewhere
+           (linked worktrees, submodules). Can be called from any thread.'''
+        git_dir = GinderGit.git_dirs.get(work_dir)
+        if not git_dir:
+            import pygit2
+            git_dir = GinderGit.git_dirs[work_dir] = pygit2.Repository(work_dir).path
+        return git_dir
+
+    @staticmethod
+    def github_repo_from_data(repo_data:dict, token:str):
+        '''Creates a PyGithub Repository object from its raw JSON data without any network traffic.'''
+        if not repo_data:
+            return None
+        try:
+            from github.Repository import Repository
+            return GinderGitHub.client(token).create_from_raw_data(Repository, repo_data)
+        except Exception:
+            return None
+
+    @staticmethod
+    def attach_local(generation:int, repo_dir:str, local_reponame:str, remote_username:str, remote_reponame:str, meta:dict = None, github_repo = None):
+        if generation != GinderGit.attach_generation:
+            return # Another file was loaded in the meantime
+        import pygit2
+        GinderLfs.register_filter()
+        GinderGit.repo_dir = repo_dir
+        GinderGit.local_repo = pygit2.Repository(repo_dir)
+        GinderGit.work_dir = GinderGit.local_repo.workdir.rstrip('/\\')
+        GinderGit.git_dirs[GinderGit.work_dir] = GinderGit.local_repo.path
+        GinderSparse.load(GinderGit.work_dir)
+        GinderGit.local_reponame = local_reponame
+        if remote_reponame:
+            GinderGit.remote_repo = GinderGit.local_repo.remotes[0]
+            GinderGit.remote_username = remote_username
+            GinderGit.remote_reponame = remote_reponame
+        if meta:
+            # Known remote: the menu is complete right away, GitHub is asked in the background
+            GinderGit.github_repo = github_repo
+            GinderGit.githubpages_url = meta.get('pages_url')
+            GinderGit.default_branch = meta.get('default_branch')
+            if github_repo:
+                GinderGit.attach_state = GinderGit.ATTACH_DONE
+        GinderWatch.start(repo_dir)
+        GinderStatus.invalidate()
+        GinderDepIndex.record_current()
+        # Complete the index for the reverse lookup. Only files changed since the last attach are opened.
+        GinderDepIndex.update(GinderGit.work_dir, None)
+        GinderSnapshots.count = GinderSnapshots.pending(GinderGit.local_repo)[1]
+
+    @staticmethod
+    def attach_remote(generation:int, github_repo, githubpages_url:str, default_branch:str):
+        if generation != GinderGit.attach_generation:
+            return
+        if github_repo:
+            GinderGit.github_repo = github_repo
+            GinderGit.githubpages_url = githubpages_url
+            GinderGit.default_branch = default_branch
+        GinderGit.attach_done(generation, GinderGit.ATTACH_DONE if github_repo else GinderGit.ATTACH_OFFLINE)
+
+        # Fetch any pending changes. A new status snapshot follows if the remote moved.
+        GinderFetch.request(force=True)
+
+    @staticmethod
+    def attach_done(generation:int, attach_state:int):
+        if generation != GinderGit.attach_generation:
+            return
+        GinderGit.attach_state = attach_state
+        tag_redraw_areas()
+
     @staticmethod
     def sync_repo():
         if not GinderState.pygit2_present():
@@ -362,13 +837,10 @@ class GinderGit:
             raise Exception('sync_repo() called without current github repo')
 
     @staticmethod
-    def create_new_repo(repo_name:str, template_username:str, template_reponame:str):
+    def create_new_repo(repo_name:str, template_username:str, template_reponame:str, token:str):
         if not GinderGit.github_user:
             raise Exception('create_new_repo() called without registered user')
-        from github import Github
-        from github import Auth
-        auth=Auth.Token(GinderPreferences.get_github_token())
-        g = Github(auth=auth)
+        g = GinderGitHub.client(token)
 
         template = f'{template_username}/{template_reponame}'
         template_repo = g.get_repo(template)
@@ -378,10 +850,8 @@ class GinderGit:
         GinderGit.remote_username = GinderGit.github_user.login
         GinderGit.remote_reponame = repo_name
 
-        g.close()
-
     @staticmethod
-    def get_github_page_url():
+    def get_github_page_url(remote_username:str, remote_reponame:str, token:str) -> str:
         # PyGithub seems to lack this API, so we need to CURL it by hand:
         # curl -L -X GET -H "Accept: application/vnd.github+json" -H "Authorization: Bearer <TOKEN>" -H "X-GitHub-Api-Version: 2022-11-28" https://api.github.com/repos/<user_login>/<repo_name>/pages
         #
@@ -392,37 +862,25 @@ class GinderGit:
         #  "html_url": "https://<user_login>.github.io/<repo_name>/",
         #  ...
         # }
-        if not GinderGit.remote_username:
+        if not remote_username:
             raise Exception('get_github_page_url() called without remote user name')
-        if not GinderGit.github_repo:
+        if not remote_reponame:
             raise Exception('get_github_page_url() called without remote repo name')
 
-        headers = {
-            "Accept"                :  "application/vnd.github+json",
-            "Authorization"         : f"Bearer {GinderPreferences.get_github_token()}",
-            "X-GitHub-Api-Version"  :  "2022-11-28"
-        }
-      
-        url = f'https://api.github.com/repos/{GinderGit.remote_username}/{GinderGit.remote_reponame}/pages'
+        url = f'{GinderGitHub.api_url}/repos/{remote_username}/{remote_reponame}/pages'
         
-        res = requests.get(url=url, headers=headers)
-        if 200 <= res.status_code and res.status_code <= 300:
-            GinderGit.githubpages_url = res.json()['html_url']
-        else:
-            raise Exception(f'Could not retrieve GitHub-page url for repo \'{GinderGit.remote_reponame}\' owned by \'{GinderGit.remote_username}\'')
+        try:
+            return GinderHttpCache.get_json(url, token)['html_url']
+        except Exception:
+            raise Exception(f'Could not retrieve GitHub-page url for repo \'{remote_reponame}\' owned by \'{remote_username}\'')
         
     @staticmethod
-    def enable_github_pages():
+    def enable_github_pages(token:str):
         if not GinderGit.github_user:
             raise Exception('enable_github_pages() called without registered user')
         if not GinderGit.github_repo:
             raise Exception('enable_github_pages() called without current github repo')
 
-        headers = {
-            "Accept"                :  "application/vnd.github+json",
-            "Authorization"         : f"Bearer {GinderPreferences.get_github_token()}",
-            "X-GitHub-Api-Version"  :  "2022-11-28"
-        }
         data = {
             "build_type"  : "workflow",
             "source"      : {
@@ -430,11 +888,11 @@ class GinderGit:
                 "path":"/docs"
             }    
         }
-        url = f'https://api.github.com/repos/{GinderGit.github_user.login}/{GinderGit.github_repo.name}/pages'
+        url = f'{GinderGitHub.api_url}/repos/{GinderGit.github_user.login}/{GinderGit.github_repo.name}/pages'
         
         # PyGithub seems to lack this API, so we need to CURL it by hand
         #curl -L -X POST -H "Accept: application/vnd.github+json" -H "Authorization: Bearer <TOKEN>" -H "X-GitHub-Api-Version: 2022-11-28" https://api.github.com/repos/griestopf/FromFreeDeeTest/pages -d '{"build_type":"workflow", "source":{"branch":"main","path":"/docs"}}'
-        res = requests.post(url=url, headers=headers, json=data)
+        res = GinderGitHub.request('POST', url, token, json=data)
         if 200 <= res.status_code and res.status_code <= 300:
             GinderGit.githubpages_url = res.json()['html_url']
         else:
@@ -442,24 +900,53 @@ class GinderGit:
         
 
     @staticmethod
-    def clone_repo(local_dir):
+    def clone_repo(local_dir, token:str, depth:int = 0):
+        '''Clones the current GitHub repo to local_dir. With depth > 0 only the last depth commits are fetched (shallow
+           clone). LFS content is downloaded for the checked out files only. Older revisions download it on demand.
+           Runs in a worker thread inside GinderTransfer.begin()/end(), reporting its progress there.'''
         if not GinderGit.github_user:
             raise Exception('clone_repo() called without registered user')
         if not GinderGit.github_repo:
             raise Exception('clone_repo() called without current github repo')
 
         import pygit2
-        credentials = pygit2.UserPass(GinderPreferences.get_github_token(),'x-oauth-basic')
+        credentials = pygit2.UserPass(token,'x-oauth-basic')
+
+        callbacks = GinderTransfer.callbacks(credentials)
+        # The checkout during clone leaves pointers for LFS content instead of downloading it file by file (see
+        # GinderLfs.downloading). Then fetch all objects of HEAD in one parallel batch and check those files out again.
+        GinderLfs.register_filter()
+        repo = pygit2.clone_repository(GinderGit.github_repo.clone_url, local_dir, callbacks=callbacks, depth=depth)
+        if not repo.head_is_unborn:
+            pointers = GinderLfs.fetch_objects(repo, repo.head.target, None, token)
+            GinderLfs.rehydrate(repo, list({path: None for paths in pointers.values() for path in paths}))
+        # libgit2 repository objects must not be shared between threads: the main thread opens its own
+        run_in_main_thread(functools.partial(GinderGit.cloned, local_dir))
+        GinderRepoMeta.update(GinderGit.github_repo.clone_url, owner=GinderGit.remote_username, name=GinderGit.remote_reponame, pages_url=GinderGit.githubpages_url,
+                              default_branch=GinderGit.github_repo.default_branch, repo_data=GinderGit.github_repo.raw_data)
+
+    @staticmethod
+    def blend_dependencies(repo_dir:str) -> list[str]:
+        '''Repo-relative paths of the current .blend file and all external files it references (see blend_references()).
+           Packed data and files outside the repo are skipped. Must be called from the main thread.'''
+        return repo_relative_paths(repo_dir, blend_references())
 
-        # class MyRemoteCallbacks(pygit2.RemoteCallbacks):
-        #     def transfer_progress(self, stats):
-        #         print(f'{stats.indexed_objects}/{stats.total_objects}')
-        # callbacks=MyRemoteCallbacks(credentials=credentials)
-        callbacks=pygit2.RemoteCallbacks(credentials=credentials)
-        GinderGit.local_repo = pygit2.clone_repository(GinderGit.github_repo.clone_url, local_dir, callbacks=callbacks)
+    @staticmethod
+    def changed_paths(old_oid, new_oid) -> list[str]:
+        '''Repo-relative paths of all files that differ between two commits.'''
+        repo = GinderGit.local_repo
+        paths = []
+        for delta in repo.diff(repo.get(old_oid), repo.get(new_oid)).deltas:
+            for path in (delta.old_file.path, delta.new_file.path):
+                if path not in paths:
+                    paths.append(path)
+        return paths
 
     @staticmethod
-    def commit(message:str):
+    def commit(message:str, paths:list[str] = None, repo = None, use_lfs:bool = None, use_chunks:bool = False) -> bool:
+        '''Commits all changes in the working tree or, if paths are given, only the changes in these (repo-relative)
+           files. Returns False if there was nothing to commit in the given paths. When committing from outside the main
+           thread, pass a repo opened by the calling thread and use_lfs/use_chunks as read from the preferences.'''
         # https://stackoverflow.com/questions/49458329/create-clone-and-push-to-github-repo-using-pygithub-and-pygit2
         if not GinderGit.github_user:
             raise Exception('commit() called without GitHub user')
@@ -467,38 +954,57 @@ class GinderGit:
             raise Exception('commit() called without local repository')
         import pygit2
 
-        index = GinderGit.local_repo.index
-        index.add_all()
+        repo = repo or GinderGit.local_repo
+        if use_lfs is None:
+            use_lfs, use_chunks = GinderPreferences.get_use_lfs(), GinderPreferences.get_use_chunks()
+        if use_lfs and GinderLfs.ensure_attributes(repo.workdir, use_chunks) and paths is not None:
+            paths = paths + ['.gitattributes']
+        index = repo.index
+        with GinderLfs.storing():
+            if paths is None:
+                # In a sparse checkout, the files missing outside the profile must not be staged as deletions
+                index.add_all(GinderSparse.pathspecs() or [])
+                GinderSparse.keep_pruned(repo, index)
+            else:
+                # status_file() only hashes a file if its stat data differs from the index entry
+                for path in paths:
+                    try:
+                        flags = repo.status_file(path)
+                    except KeyError:
+                        continue
+                    if flags & pygit2.enums.FileStatus.WT_DELETED:
+                        index.remove(path)
+                    elif flags & (pygit2.enums.FileStatus.WT_NEW | pygit2.enums.FileStatus.WT_MODIFIED | pygit2.enums.FileStatus.WT_TYPECHANGE):
+                        index.add(path)
         index.write()
+        tree = index.write_tree()
+        if paths is not None and not repo.head_is_unborn and tree == repo.head.peel(pygit2.Commit).tree_id:
+            return False
         author = pygit2.Signature(GinderGit.github_user.name, GinderGit.github_useremail)
         commiter = pygit2.Signature(GinderGit.github_user.name, GinderGit.github_useremail)
-        tree = index.write_tree()
-        oid = GinderGit.local_repo.create_commit(GinderGit.local_repo.head.name, author, commiter, message, tree,[GinderGit.local_repo.head.target])
+        oid = repo.create_commit(repo.head.name, author, commiter, message, tree,[repo.head.target])
+        return True
 
     @staticmethod
-    def push():
+    def push(token:str, repo = None, max_attempts:int = 1):
+        '''Pushes the current branch (see GinderPush). Pass a repo opened by the calling thread when pushing from outside the
+           main thread. Retries (with backoff) only make sense there, the main thread would freeze while waiting.
+           The GitHub token must be read on the main thread (see GinderPreferences.get_github_token).'''
         if not GinderGit.github_user:
             raise Exception('push() called without GitHub user')
         if not GinderGit.local_repo:
             raise Exception('push() called without local repository')
         if not GinderGit.remote_repo:
             raise Exception('push() called without remote repository')
-        import pygit2
-
-        remote = GinderGit.remote_repo
-        credentials = pygit2.UserPass(GinderPreferences.get_github_token(),'x-oauth-basic')
-
-        # class MyRemoteCallbacks(pygit2.RemoteCallbacks):
-        #     def transfer_progress(self, stats):
-        #         print(f'{stats.indexed_objects}/{stats.total_objects}')
-        # callbacks=MyRemoteCallbacks(credentials=credentials)
-        callbacks=pygit2.RemoteCallbacks(credentials=credentials)
-        remote.push([GinderGit.local_repo.head.name], callbacks=callbacks)
 
+        repo = repo or GinderGit.local_repo
+        GinderPush.run(repo, repo.remotes[GinderGit.remote_repo.name], token, max_attempts)
 
     @staticmethod
-    def fetch():
-        '''Performs a git fetch.'''
+    def fetch(repo = None, depth:int = 0, token:str = None, progress:bool = False):
+        '''Performs a git fetch. Pass a repo opened by the calling thread and the GitHub token when fetching from outside
+           the main thread. A depth > 0 deepens (or, with unshallow_depth, completes) the history of a shallow clone.
+           With progress, the fetch reports to GinderTransfer (and can be cancelled), see fetch_then().'''
         if not GinderGit.github_user:
             raise Exception('fetch() called without GitHub user')
         if not GinderGit.local_repo:
@@ -507,42 +1013,71 @@ class GinderGit:
             raise Exception('fetch() called without remote repository')
         import pygit2
 
-        remote = GinderGit.remote_repo
-        credentials = pygit2.UserPass(GinderPreferences.get_github_token(),'x-oauth-basic')
+        remote = repo.remotes[GinderGit.remote_repo.name] if repo else GinderGit.remote_repo
+        credentials = pygit2.UserPass(token if token is not None else GinderPreferences.get_github_token(),'x-oauth-basic')
 
-        # class MyRemoteCallbacks(pygit2.RemoteCallbacks):
-        #     def transfer_progress(self, stats):
-        #         print(f'{stats.indexed_objects}/{stats.total_objects}')
-        # callbacks=MyRemoteCallbacks(credentials=credentials)
-        callbacks=pygit2.RemoteCallbacks(credentials=credentials)
-        remote.fetch(callbacks=callbacks)
+        callbacks = GinderTransfer.callbacks(credentials, progress)
+        remote.fetch(callbacks=callbacks, depth=depth)
 
     @staticmethod
-    def refetch():
-        '''Performs a git fetch if the last fetch is not too far away'''
-        curtime = time.time()
-        if curtime - GinderGit.last_fetch_time > GinderGit.fetch_period:
-            GinderGit.fetch()
-            GinderGit.last_fetch_time = curtime
-        
+    def fetch_then(operation:str, continuation):
+        '''Main thread only. Fetches in a worker thread with progress in the Ginder menu, where the user can cancel it,
+           and then calls continuation on the main thread. A failed or cancelled fetch skips the continuation.'''
+        token = GinderPreferences.get_github_token()
+        repo_dir = GinderGit.repo_dir
+        GinderTransfer.begin(operation)
+
+        def run():
+            try:
+                import pygit2
+                GinderGit.fetch(pygit2.Repository(repo_dir), token=token, progress=True)
+            except TransferCancelled as ex:
+                print(f'Ginder: {str(ex)}')
+                return
+            except Exception as ex:
+                run_in_main_thread(functools.partial(report_error, 'ERROR', f'Could not fetch from {GinderGit.remote_reponame}.\n{ex}'))
+                return
+            finally:
+                GinderTransfer.end()
+            run_in_main_thread(continuation)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def fetch_history():
+        '''Fetches the complete history if the local repo is a shallow clone.'''
+        if GinderGit.local_repo and GinderGit.local_repo.is_shallow:
+            GinderGit.fetch(depth=GinderGit.unshallow_depth)
+
+    @staticmethod
+    def cloned(local_dir:str):
+        import pygit2
+        GinderGit.local_repo = pygit2.Repository(local_dir)
+
 
     # inspired by https://github.com/MichaelBoselowitz/pygit2-examples/blob/master/examples.py#L54
     @staticmethod
     def pull(keep_theirs:bool):
+        '''Main thread only, after fetching (see fetch_then). Wrap in GinderLfs.downloading() to let the checkout download
+           LFS content the batch missed.'''
         import pygit2
         remote_name = 'origin'
-        branch = 'main'
+        branch = GinderGit.default_branch or 'main'
         for remote in GinderGit.local_repo.remotes:
             if remote.name == remote_name:
-                GinderGit.fetch()
                 remote_master_id = GinderGit.local_repo.lookup_reference(f'refs/remotes/{remote_name}/{branch}').target
                 merge_result, _ = GinderGit.local_repo.merge_analysis(remote_master_id)
+                if not merge_result & pygit2.GIT_MERGE_ANALYSIS_UP_TO_DATE:
+                    # Download the LFS content of the incoming changes in one batch before checkout smudges it
+                    GinderLfs.fetch_objects(GinderGit.local_repo, remote_master_id, GinderGit.local_repo.head.target, GinderPreferences.get_github_token())
                 # Up to date, do nothing
                 if merge_result & pygit2.GIT_MERGE_ANALYSIS_UP_TO_DATE:
                     return
                 # We can just fastforward
                 elif merge_result & pygit2.GIT_MERGE_ANALYSIS_FASTFORWARD:
-                    GinderGit.local_repo.checkout_tree(GinderGit.local_repo.get(remote_master_id))
+                    remote_tree = GinderGit.local_repo.get(remote_master_id).peel(pygit2.Tree)
+                    GinderGit.local_repo.checkout_tree(remote_tree, paths=GinderSparse.pathspecs())
+                    GinderSparse.sync_index(GinderGit.local_repo, remote_tree)
                     try:
                         master_ref = GinderGit.local_repo.lookup_reference('refs/heads/%s' % (branch))
                         master_ref.set_target(remote_master_id)
@@ -556,54 +1091,2072 @@ class GinderGit:
                     #     for conflict in GinderGit.local_repo.index.conflicts:
                     #         print('Conflicts found in:', conflict[0].path)
                     #     raise AssertionError('Conflicts, ahhhhh!!')
+                    # The merge base may be older than what a shallow clone has
+                    GinderGit.fetch_history()
+                    # A merge takes files missing outside the sparse checkout profile for local deletions
+                    GinderSparse.restore(GinderGit.local_repo, GinderGit.changed_paths(GinderGit.local_repo.head.target, remote_master_id))
                     favor = pygit2.enums.MergeFavor.THEIRS if keep_theirs else pygit2.enums.MergeFavor.OURS
                     GinderGit.local_repo.merge(remote_master_id, favor=favor)
 
-                    # This should never happen with favor=THEIRS or OURS
-                    if GinderGit.local_repo.index.conflicts is not None:
-                        raise AssertionError(f'push() encountered conflicts during merge although merged with {favor}.')
+                    # This should never happen with favor=THEIRS or OURS
+                    if GinderGit.local_repo.index.conflicts is not None:
+                        raise AssertionError(f'push() encountered conflicts during merge although merged with {favor}.')
+
+                    user = GinderGit.local_repo.default_signature
+                    tree = GinderGit.local_repo.index.write_tree()
+                    commit = GinderGit.local_repo.create_commit('HEAD',
+                                                user,
+                                                user,
+                                                'Merge!',
+                                                tree,
+                                                [GinderGit.local_repo.head.target, remote_master_id])
+                    # We need to do this or git CLI will think we are still merging.
+                    GinderGit.local_repo.state_cleanup()
+                    # The merge wrote changed files regardless of the sparse checkout profile
+                    GinderSparse.prune(GinderGit.local_repo)
+                else:
+                    raise AssertionError('Unknown merge analysis result')
+
+
+
+    @staticmethod
+    def pending_local_changes(repo = None) -> int:
+        '''Returns the number of changes on the local git repository (file changes not added to the index and/or not committed)'''
+        repo = repo or GinderGit.local_repo
+        if not repo:
+            return 0
+
+        index = repo.index
+        index.read()
+        return sum(1 for delta in index.diff_to_workdir().deltas if GinderSparse.includes(delta.new_file.path))
+
+    @staticmethod
+    def pending_synch_changes(repo = None) -> tuple[int, int]:
+        '''Returns the number of ahead and behind commits of the local HEAD compared to the remote HEAD (origin).
+           The first int of the returned tuple ist the number of commits the local branch is AHEAD of the 
+           remote branch - the number of changes that need to be pushed to the remote repo.
+           The second int of the returned tuple ist the number of commits the local branch is BEHIND the
+           remote branch - the number of changes that need to be pulled from the remote repo.
+        '''
+        # From answer 3 in https://stackoverflow.com/questions/19930935/how-to-calculate-ahead-or-behind-branchs
+        repo = repo or GinderGit.local_repo
+        if not repo:
+            raise Exception('pending_synch_changes() called without local repository')
+
+        upstream_head = repo.revparse_single('origin/HEAD')
+        local_head    = repo.revparse_single('HEAD')
+        diff = repo.ahead_behind(local_head.id, upstream_head.id)
+        return diff
+
+
+#######################################################################################################
+#
+#  TRANSFER PROGRESS AND CANCELLATION
+#
+#######################################################################################################
+
+def format_bytes(n:float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+
+
+class TransferCancelled(Exception):
+    '''Raised from a transfer callback to make libgit2 (or an LFS transfer) abort.'''
+
+
+class PushRejected(Exception):
+    '''Raised if the remote refused to update a reference (e.g. not a fast-forward or denied by a hook).'''
+
+
+class GinderTransfer:
+    '''Progress and cancellation of the clone, fetch or push the user is waiting for. They run in worker threads
+       (see CreateNewPresentationRepo, GinderGit.fetch_then and GinderPublish). The pygit2 callbacks from callbacks()
+       report received/sent objects and bytes, resolved deltas, throughput and ETA to UIUpdate and raise
+       TransferCancelled once cancel() was called. The Ginder menu shows the progress and a cancel button.
+       report() does nothing unless a transfer was begun.
+    '''
+    redraw_period: float = 0.25
+    active: bool = False
+    operation: str = ''
+    started: float = 0.0
+    last_redraw: float = 0.0
+    cancel_event = threading.Event()
+
+    @staticmethod
+    def begin(operation:str, area:bpy.types.Area = None):
+        '''Can be called from any thread.'''
+        GinderTransfer.cancel_event.clear()
+        GinderTransfer.operation = operation
+        GinderTransfer.restart()
+        GinderTransfer.active = True
+        run_in_main_thread(functools.partial(UIUpdate.progress_init, area, msg=f'{operation}...'))
+
+    @staticmethod
+    def restart():
+        '''Restarts the throughput and ETA computation (e.g. for the next phase of an operation).'''
+        GinderTransfer.started = time.monotonic()
+
+    @staticmethod
+    def end():
+        '''Can be called from any thread.'''
+        GinderTransfer.active = False
+        GinderTransfer.cancel_event.clear()
+        run_in_main_thread(UIUpdate.end_progress)
+        run_in_main_thread(tag_redraw_areas)
+
+    @staticmethod
+    def cancel():
+        GinderTransfer.cancel_event.set()
+
+    @staticmethod
+    def check():
+        if GinderTransfer.cancel_event.is_set():
+            raise TransferCancelled(f'{GinderTransfer.operation or "Transfer"} cancelled')
+
+    @staticmethod
+    def show(progress:float, message:str):
+        UIUpdate.set_progress(progress, message)
+        tag_redraw_areas()
+
+    @staticmethod
+    def report(progress:float, message:str):
+        '''Called from the transfer's thread. Hands the progress to the main thread at most every redraw_period seconds.'''
+        if not GinderTransfer.active:
+            return
+        GinderTransfer.check()
+        now = time.monotonic()
+        if now - GinderTransfer.last_redraw >= GinderTransfer.redraw_period or progress >= 1.0:
+            GinderTransfer.last_redraw = now
+            run_in_main_thread(functools.partial(GinderTransfer.show, progress, message))
+
+    @staticmethod
+    def rate_text(done:int, total:int, nbytes:int, unit:str) -> str:
+        elapsed = max(time.monotonic() - GinderTransfer.started, 1e-3)
+        text = f'{done}/{total} {unit}, {format_bytes(nbytes)} at {format_bytes(nbytes / elapsed)}/s'
+        if 0 < done < total:
+            eta = int(elapsed * (total - done) / done)
+            text += f', {eta // 60}:{eta % 60:02d} left'
+        return text
+
+    @staticmethod
+    def callbacks(credentials, progress:bool = True):
+        '''RemoteCallbacks for clone, fetch and push. Without progress (background fetches) nothing is reported.
+           Pushes always use progress, their rejected references are only visible in push_update_reference.'''
+        import pygit2
+        if not progress:
+            return pygit2.RemoteCallbacks(credentials=credentials)
+
+        class GinderRemoteCallbacks(pygit2.RemoteCallbacks):
+            def transfer_progress(self, stats):
+                if stats.total_deltas and stats.received_objects == stats.total_objects:
+                    GinderTransfer.report(0.9 + 0.1 * stats.indexed_deltas / stats.total_deltas, f'Resolving deltas {stats.indexed_deltas}/{stats.total_deltas}')
+                elif stats.total_objects:
+                    received = stats.received_objects / stats.total_objects
+                    GinderTransfer.report(received if received == 1.0 else 0.9 * received,
+                                          'Receiving ' + GinderTransfer.rate_text(stats.received_objects, stats.total_objects, stats.received_bytes, 'objects'))
+                else:
+                    GinderTransfer.check()
+
+            def push_transfer_progress(self, objects_pushed, total_objects, bytes_pushed):
+                GinderTransfer.report(objects_pushed / total_objects if total_objects else 0.0,
+                                      'Sending ' + GinderTransfer.rate_text(objects_pushed, total_objects, bytes_pushed, 'objects'))
+
+            def push_update_reference(self, refname, message):
+                # libgit2 reports a rejected reference here only, remote.push() itself succeeds
+                if message:
+                    raise PushRejected(f'{refname}: {message}')
+
+        return GinderRemoteCallbacks(credentials=credentials)
+
+
+#######################################################################################################
+#
+#  GIT LFS
+#
+#######################################################################################################
+
+# Files Ginder puts under LFS when it writes the .gitattributes of a repo (see GinderLfs.ensure_attributes)
+lfs_tracked_patterns = ['*.blend', '*.png', '*.jpg', '*.jpeg', '*.tif', '*.tiff', '*.tga', '*.bmp', '*.exr', '*.hdr', '*.psd', '*.webp',
+                        '*.abc', '*.usdc', '*.vdb', '*.fbx', '*.glb', '*.mp4', '*.mov', '*.wav', '*.flac', '*.mp3', '*.ogg']
+
+
+class LfsPointer(NamedTuple):
+    '''The small text file git stores instead of the content of an LFS tracked file (https://github.com/git-lfs/git-lfs/blob/main/docs/spec.md).'''
+    oid: str        # sha256 of the content, hex
+    size: int
+
+    version = 'https://git-lfs.github.com/spec/v1'
+    max_size = 1024
+
+    def text(self) -> bytes:
+        return f'version {LfsPointer.version}\noid sha256:{self.oid}\nsize {self.size}\n'.encode('ascii')
+
+    @staticmethod
+    def parse(data:bytes) -> 'LfsPointer':
+        '''Returns the pointer stored in data or None if data is not an LFS pointer.'''
+        if len(data) > LfsPointer.max_size or not data.startswith(b'version '):
+            return None
+        try:
+            fields = dict(line.split(' ', 1) for line in data.decode('ascii').splitlines() if line)
+            if fields['version'] != LfsPointer.version or not fields['oid'].startswith('sha256:'):
+                return None
+            return LfsPointer(fields['oid'][len('sha256:'):], int(fields['size']))
+        except (UnicodeDecodeError, ValueError, KeyError):
+            return None
+
+
+# Files stored as content-defined chunks if the repo's .gitattributes mark them "ginder-chunked" (see GinderChunks)
+lfs_chunked_patterns = ['*.blend']
+
+
+class ChunkManifest(NamedTuple):
+    '''Stored in git instead of an LFS pointer for chunked files: the content's oid and size plus the list of chunks,
+       each of which is an LFS object of its own. Line based, so git deltas successive manifests well.'''
+    oid: str
+    size: int
+    chunks: list     # [LfsPointer]
+
+    version = 'https://github.com/griestopf/ginder/spec/chunks/v1'
+
+    def text(self) -> bytes:
+        lines = [f'version {ChunkManifest.version}', f'oid sha256:{self.oid}', f'size {self.size}', f'chunks {len(self.chunks)}']
+        lines += [f'{chunk.oid} {chunk.size}' for chunk in self.chunks]
+        return ('\n'.join(lines) + '\n').encode('ascii')
+
+    @staticmethod
+    def is_manifest(data:bytes) -> bool:
+        return data.startswith(f'version {ChunkManifest.version}\n'.encode('ascii'))
+
+    @staticmethod
+    def parse(data:bytes) -> 'ChunkManifest':
+        '''Returns the manifest stored in data or None if data is not a chunk manifest.'''
+        if not ChunkManifest.is_manifest(data):
+            return None
+        try:
+            lines = data.decode('ascii').splitlines()
+            fields = dict(line.split(' ', 1) for line in lines[1:4])
+            chunks = [LfsPointer(oid, int(size)) for oid, size in (line.split(' ') for line in lines[4:] if line)]
+            if not fields['oid'].startswith('sha256:') or len(chunks) != int(fields['chunks']):
+                return None
+            return ChunkManifest(fields['oid'][len('sha256:'):], int(fields['size']), chunks)
+        except (UnicodeDecodeError, ValueError, KeyError):
+            return None
+
+
+def gear_table(seed:int) -> list[int]:
+    '''256 pseudo random 64 bit values. Fixed seed: every Ginder installation must cut chunks at the same positions.'''
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(256)]
+
+
+class GinderChunks:
+    '''Content-defined chunking (gear hash over a 64 byte window, cut where its top bits are zero) for large, often
+       re-saved files. An edit only changes the chunks around it, so successive .blend revisions share most chunks:
+       they are stored once in the LFS object store and only new chunks are transferred on push and pull.
+       Uses numpy (bundled with Blender) to hash a whole block at a time, with a byte-by-byte fallback.
+    '''
+    min_size: int = 128 << 10
+    max_size: int = 2 << 20
+    mask_bits: int = 19         # Average chunk size about min_size + 512 KiB
+    window: int = 64            # Bytes a gear hash value depends on (64 bit hash, one shift per byte)
+    block_size: int = 8 << 20
+    gear: list = gear_table(0x67696e646572)
+
+    @staticmethod
+    def candidates(data:bytes, context:bytes, offset:int) -> list[int]:
+        '''Absolute positions (offset = position of data[0]) after which a chunk may end. context holds the bytes
+           preceding data (up to window - 1) so the hash continues across blocks.'''
+        shift = 64 - GinderChunks.mask_bits
+        try:
+            import numpy as np
+        except ImportError:
+            mask = (1 << 64) - 1
+            h = 0
+            for b in context:
+                h = ((h << 1) + GinderChunks.gear[b]) & mask
+            result = []
+            for i, b in enumerate(data):
+                h = ((h << 1) + GinderChunks.gear[b]) & mask
+                if not h >> shift:
+                    result.append(offset + i)
+            return result
+        # h[i] = sum(gear[b[i - k]] << k for k < 64), built by doubling the window: log2(64) vectorized steps
+        h = np.array(GinderChunks.gear, dtype=np.uint64)[np.frombuffer(context + data, dtype=np.uint8)]
+        width = 1
+        while width < GinderChunks.window:
+            h[width:] += h[:-width] << np.uint64(width)
+            width *= 2
+        return (np.flatnonzero((h[len(context):] >> np.uint64(shift)) == 0) + offset).tolist()
+
+    @staticmethod
+    def split(f) -> list[tuple[int, int]]:
+        '''Chunk boundaries of the content of the binary file object f as [(offset, length)].'''
+        import bisect
+        chunks = []
+        start = 0
+        offset = 0
+        context = b''
+        while data := f.read(GinderChunks.block_size):
+            end = offset + len(data)
+            candidates = GinderChunks.candidates(data, context, offset)
+            while True:
+                i = bisect.bisect_left(candidates, start + GinderChunks.min_size - 1)
+                if i < len(candidates) and candidates[i] + 1 - start <= GinderChunks.max_size:
+                    cut = candidates[i] + 1
+                elif start + GinderChunks.max_size <= end:
+                    cut = start + GinderChunks.max_size
+                else:
+                    break
+                chunks.append((start, cut - start))
+                start = cut
+            context = data[-(GinderChunks.window - 1):]
+            offset = end
+        if offset > start:
+            chunks.append((start, offset - start))
+        return chunks
+
+    @staticmethod
+    def store(git_dir:str, path:str, oid:str, size:int, keep:bool = True) -> ChunkManifest:
+        '''Splits the file at path into chunks and returns the manifest. With keep, new chunks are added to the LFS object store.'''
+        chunks = []
+        with open(path, 'rb') as f:
+            for offset, length in GinderChunks.split(f):
+                f.seek(offset)
+                data = f.read(length)
+                chunk = LfsPointer(hashlib.sha256(data).hexdigest(), length)
+                if keep and not os.path.exists(GinderLfs.object_path(git_dir, chunk.oid)):
+                    tmp_path = GinderLfs.tmp_path(git_dir)
+                    with open(tmp_path, 'wb') as tmp:
+                        tmp.write(data)
+                    GinderLfs.store(git_dir, chunk.oid, tmp_path)
+                chunks.append(chunk)
+        return ChunkManifest(oid, size, chunks)
+
+
+class GinderLfs:
+    '''Native Git LFS support. A pygit2 filter replaces the content of LFS tracked files by pointers when staging
+       (clean) and puts the content back on checkout (smudge), using the local object store in .git/lfs/objects
+       (the same layout as git-lfs, so the command line tools work on Ginder repos). Files marked "ginder-chunked" are
+       stored as a chunk manifest, each chunk being an LFS object (see GinderChunks). Objects are transferred with the
+       LFS batch API in parallel: uploaded before a push, downloaded before clone/pull checkouts.
+       The LFS server is the remote's "<url>.git/info/lfs" or the "lfs.url" set in the repo's git config.
+    '''
+    transfers: int = 8          # Parallel uploads/downloads
+    batch_size: int = 100       # Objects per batch API request
+    chunk_size: int = 1 << 20
+    media_type = 'application/vnd.git-lfs+json'
+    filter_registered: bool = False
+    local = threading.local()   # Per thread: whether the clean filter stores content and may download (see storing(), downloading())
+
+    @staticmethod
+    def objects_dir(git_dir:str) -> str:
+        return os.path.join(git_dir, 'lfs', 'objects')
+
+    @staticmethod
+    def object_path(git_dir:str, oid:str) -> str:
+        return os.path.join(GinderLfs.objects_dir(git_dir), oid[0:2], oid[2:4], oid)
+
+    @staticmethod
+    def tmp_path(git_dir:str) -> str:
+        tmp_dir = os.path.join(git_dir, 'lfs', 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, f'{threading.get_ident()}-{time.monotonic_ns()}')
+
+    @staticmethod
+    def store(git_dir:str, oid:str, tmp_path:str):
+        '''Moves a verified temp file into the object store.'''
+        path = GinderLfs.object_path(git_dir, oid)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def storing():
+        '''Within this block, the clean filter adds file content to the object store (staging for commits and snapshots).
+           Elsewhere, e.g. when status scans hash the working tree, it only computes the pointer.'''
+        GinderLfs.local.store = True
+        try:
+            yield
+        finally:
+            GinderLfs.local.store = False
+
+    @staticmethod
+    @contextlib.contextmanager
+    def downloading(token:str):
+        '''Within this block, checkouts on the calling thread download content missing from the object store (e.g. of
+           revisions not downloaded with clone/pull) with the given token. Read the token on the main thread.
+           Elsewhere the smudge filter leaves the pointer in the working tree.'''
+        GinderLfs.local.download_token = token
+        try:
+            yield
+        finally:
+            GinderLfs.local.download_token = None
+
+    @staticmethod
+    def register_filter():
+        if GinderLfs.filter_registered:
+            return
+        import pygit2
+
+        class LfsFilter(pygit2.Filter):
+            attributes = 'filter=lfs ginder-chunked'
+
+            def check(self, src, attr_values):
+                self.git_dir = src.repo.path
+                # libgit2 hands set attributes over as its internal "true" marker
+                self.chunked = attr_values[1] == '[internal]__TRUE__'
+                self.to_odb = src.mode == pygit2.enums.FilterMode.TO_ODB
+                self.store = getattr(GinderLfs.local, 'store', False)
+                self.head = b''         # Input kept in memory as long as it might be a pointer
+                self.spilled = False    # Clean: the input is not a pointer and is being hashed
+                self.tmp = None         # Clean: content streamed to a temp file if it is stored or chunked
+                self.sha = hashlib.sha256()
+                self.size = 0
+
+            def write(self, data, src, write_next):
+                if not self.to_odb or (not self.spilled and (len(self.head) + len(data) <= LfsPointer.max_size or ChunkManifest.is_manifest(self.head))):
+                    self.head += data
+                    return
+                if not self.spilled:
+                    self.spill()
+                self.add(data)
+
+            def spill(self):
+                self.spilled = True
+                if self.store or self.chunked:
+                    self.tmp_path = GinderLfs.tmp_path(self.git_dir)
+                    self.tmp = open(self.tmp_path, 'wb')
+                self.add(self.head)
+                self.head = b''
+
+            def add(self, data):
+                self.sha.update(data)
+                self.size += len(data)
+                if self.tmp:
+                    self.tmp.write(data)
+
+            def close(self, write_next):
+                pointer = (LfsPointer.parse(self.head) or ChunkManifest.parse(self.head)) if not self.spilled else None
+                if self.to_odb:
+                    if pointer:
+                        # Already a pointer (e.g. a file whose content was never downloaded)
+                        write_next(self.head)
+                        return
+                    if not self.spilled:
+                        self.spill()
+                    if self.tmp:
+                        self.tmp.close()
+                    oid = self.sha.hexdigest()
+                    if self.chunked:
+                        manifest = GinderChunks.store(self.git_dir, self.tmp_path, oid, self.size, self.store)
+                        os.remove(self.tmp_path)
+                        write_next(manifest.text())
+                    else:
+                        if self.store:
+                            GinderLfs.store(self.git_dir, oid, self.tmp_path)
+                        write_next(LfsPointer(oid, self.size).text())
+                    return
+                parts = pointer.chunks if isinstance(pointer, ChunkManifest) else [pointer] if pointer else []
+                paths = [GinderLfs.object_path(self.git_dir, part.oid) for part in parts]
+                token = getattr(GinderLfs.local, 'download_token', None)
+                if paths and not all(os.path.exists(path) for path in paths) and token is not None:
+                    # Content of a revision not downloaded with clone/pull (e.g. an older one): get it now
+                    try:
+                        GinderLfs.download(pygit2.Repository(self.git_dir), parts, token)
+                    except Exception as ex:
+                        print(f'Ginder: could not download LFS content: {str(ex)}')
+                if not paths or not all(os.path.exists(path) for path in paths):
+                    # Not a pointer, or content not downloaded: leave the pointer in the working tree
+                    write_next(self.head)
+                    return
+                for path in paths:
+                    with open(path, 'rb') as f:
+                        while chunk := f.read(GinderLfs.chunk_size):
+                            write_next(chunk)
+
+        pygit2.filter_register('lfs', LfsFilter)
+        GinderLfs.filter_registered = True
+
+    @staticmethod
+    def unregister_filter():
+        if not GinderLfs.filter_registered:
+            return
+        import pygit2
+        pygit2.filter_unregister('lfs')
+        GinderLfs.filter_registered = False
+
+    @staticmethod
+    def ensure_attributes(repo_dir:str, chunked:bool = False) -> bool:
+        '''Adds the LFS tracking rules for Blender assets to the repo's .gitattributes and, if chunked is set, marks the
+           lfs_chunked_patterns "ginder-chunked". Returns True if the file changed.'''
+        path = os.path.join(repo_dir, '.gitattributes')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        changed = False
+        patterns = set()
+        for i, line in enumerate(lines):
+            if not line.strip() or line.startswith('#'):
+                continue
+            pattern = line.split()[0]
+            patterns.add(pattern)
+            if chunked and pattern in lfs_chunked_patterns and 'filter=lfs' in line.split() and 'ginder-chunked' not in line.split():
+                lines[i] = line + ' ginder-chunked'
+                changed = True
+        for pattern in lfs_tracked_patterns:
+            if pattern not in patterns:
+                lines.append(f'{pattern} filter=lfs diff=lfs merge=lfs -text' + (' ginder-chunked' if chunked and pattern in lfs_chunked_patterns else ''))
+                changed = True
+        if not changed:
+            return False
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write('\n'.join(lines) + '\n')
+        return True
+
+    @staticmethod
+    def endpoint(repo, remote_name:str = 'origin') -> str:
+        try:
+            return repo.config['lfs.url'].rstrip('/')
+        except KeyError:
+            pass
+        url = repo.remotes[remote_name].url
+        if not url.startswith(('https://', 'http://')):
+            raise Exception(f'Git LFS needs an http(s) remote, not {url}')
+        url = url.rstrip('/')
+        return (url if url.endswith('.git') else url + '.git') + '/info/lfs'
+
+    @staticmethod
+    def pointers(repo, tree, paths:list[str] = None) -> dict:
+        '''The LFS pointers in tree (all, or only in the given repo-relative paths) as {pointer: [paths]}. Chunk
+           manifests contribute one pointer per chunk. Only reads blobs small enough to be a pointer, or a manifest.'''
+        import pygit2
+        import fnmatch
+        result = {}
+        def add(path, entry_id):
+            _, size = repo.odb.read_header(entry_id)
+            if size <= LfsPointer.max_size:
+                pointer = LfsPointer.parse(repo.get(entry_id).data)
+                if pointer:
+                    result.setdefault(pointer, []).append(path)
+                    return
+            if any(fnmatch.fnmatch(path.rsplit('/', 1)[-1], pattern) for pattern in lfs_chunked_patterns) and repo.get_attr(path, 'ginder-chunked') is True:
+                manifest = ChunkManifest.parse(repo.get(entry_id).data)
+                for chunk in (manifest.chunks if manifest else []):
+                    if path not in result.setdefault(chunk, []):
+                        result[chunk].append(path)
+        if paths is not None:
+            for path in paths:
+                try:
+                    entry = tree[path]
+                except KeyError:
+                    continue
+                if entry.type == pygit2.enums.ObjectType.BLOB:
+                    add(path, entry.id)
+            return result
+        todo = [('', tree)]
+        while todo:
+            prefix, subtree = todo.pop()
+            for entry in subtree:
+                if entry.type == pygit2.enums.ObjectType.TREE:
+                    todo.append((prefix + entry.name + '/', entry))
+                elif entry.type == pygit2.enums.ObjectType.BLOB:
+                    add(prefix + entry.name, entry.id)
+        return result
+
+    @staticmethod
+    def batch(repo, operation:str, pointers:list[LfsPointer], token:str) -> list[dict]:
+        '''Asks the LFS server how to transfer the given objects. Returns the response's "objects".'''
+        url = GinderLfs.endpoint(repo) + '/objects/batch'
+        headers = {'Accept': GinderLfs.media_type, 'Content-Type': GinderLfs.media_type}
+        auth = (token, 'x-oauth-basic') if token else None
+        objects = []
+        for start in range(0, len(pointers), GinderLfs.batch_size):
+            request = {'operation': operation, 'transfers': ['basic'],
+                       'objects': [{'oid': pointer.oid, 'size': pointer.size} for pointer in pointers[start:start + GinderLfs.batch_size]]}
+            response = GinderGitHub.session().post(url, json=request, headers=headers, auth=auth, timeout=GinderGitHub.timeout)
+            response.raise_for_status()
+            objects += response.json().get('objects', [])
+        for object in objects:
+            if 'error' in object:
+                raise Exception(f'LFS {operation} of {object["oid"]} failed: {object["error"].get("message", object["error"])}')
+        return objects
+
+    @staticmethod
+    def transfer(function, objects:list, label:str):
+        '''Runs function for all objects in parallel, reporting progress and stopping early if cancelled.'''
+        from concurrent.futures import ThreadPoolExecutor
+        total = len(objects)
+        done = {'objects': 0, 'bytes': 0}
+        lock = threading.Lock()
+        GinderTransfer.restart()
+
+        def run(object):
+            GinderTransfer.check()
+            function(object)
+            with lock:
+                done['objects'] += 1
+                done['bytes'] += object['size']
+                GinderTransfer.report(done['objects'] / total, f'{label} ' + GinderTransfer.rate_text(done['objects'], total, done['bytes'], 'LFS objects'))
+
+        with ThreadPoolExecutor(max_workers=GinderLfs.transfers, thread_name_prefix='GinderLfs') as pool:
+            for _ in pool.map(run, objects):
+                pass
+
+    @staticmethod
+    def download(repo, pointers:list[LfsPointer], token:str) -> int:
+        '''Downloads the objects not yet in the local store. Returns the number of downloaded objects.'''
+        git_dir = repo.path
+        missing = [pointer for pointer in pointers if not os.path.exists(GinderLfs.object_path(git_dir, pointer.oid))]
+        if not missing:
+            return 0
+        objects = [object for object in GinderLfs.batch(repo, 'download', missing, token) if 'download' in object.get('actions', {})]
+
+        def download_one(object):
+            action = object['actions']['download']
+            tmp_path = GinderLfs.tmp_path(git_dir)
+            sha = hashlib.sha256()
+            with GinderGitHub.session().get(action['href'], headers=action.get('header', {}), stream=True, timeout=GinderGitHub.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(GinderLfs.chunk_size):
+                        sha.update(chunk)
+                        f.write(chunk)
+            if sha.hexdigest() != object['oid']:
+                os.remove(tmp_path)
+                raise Exception(f'LFS object {object["oid"]} downloaded with wrong content')
+            GinderLfs.store(git_dir, object['oid'], tmp_path)
+
+        GinderLfs.transfer(download_one, objects, 'Downloading')
+        return len(objects)
+
+    @staticmethod
+    def upload(repo, pointers:list[LfsPointer], token:str) -> int:
+        '''Uploads the objects the LFS server doesn't have yet. Returns the number of uploaded objects.'''
+        git_dir = repo.path
+        present = [pointer for pointer in pointers if os.path.exists(GinderLfs.object_path(git_dir, pointer.oid))]
+        if not present:
+            return 0
+        objects = [object for object in GinderLfs.batch(repo, 'upload', present, token) if 'upload' in object.get('actions', {})]
+
+        def upload_one(object):
+            action = object['actions']['upload']
+            with open(GinderLfs.object_path(git_dir, object['oid']), 'rb') as f:
+                response = GinderGitHub.session().put(action['href'], data=f, headers=action.get('header', {}), timeout=GinderGitHub.timeout)
+            response.raise_for_status()
+            verify = object['actions'].get('verify')
+            if verify:
+                headers = dict(verify.get('header', {}), **{'Accept': GinderLfs.media_type, 'Content-Type': GinderLfs.media_type})
+                response = GinderGitHub.session().post(verify['href'], json={'oid': object['oid'], 'size': object['size']}, headers=headers, timeout=GinderGitHub.timeout)
+                response.raise_for_status()
+
+        GinderLfs.transfer(upload_one, objects, 'Uploading')
+        return len(objects)
+
+    @staticmethod
+    def push_objects(repo, local_oid, remote_oid, token:str) -> int:
+        '''Uploads the LFS objects introduced by the commits between remote_oid (None: all) and local_oid.'''
+        import pygit2
+        pointers = {}
+        walker = repo.walk(local_oid, pygit2.enums.SortMode.TOPOLOGICAL)
+        if remote_oid:
+            walker.hide(remote_oid)
+        for commit in walker:
+            if commit.parents:
+                paths = [delta.new_file.path for delta in repo.diff(commit.parents[0].tree, commit.tree).deltas]
+                pointers.update(GinderLfs.pointers(repo, commit.tree, paths))
+            else:
+                pointers.update(GinderLfs.pointers(repo, commit.tree))
+        return GinderLfs.upload(repo, list(pointers), token)
+
+    @staticmethod
+    def fetch_objects(repo, new_oid, old_oid, token:str) -> dict:
+        '''Downloads the LFS objects a checkout of commit new_oid needs. If old_oid is given, only looks at the files that
+           changed since. Returns {pointer: [paths]}.'''
+        import pygit2
+        new_tree = repo.get(new_oid).peel(pygit2.Tree)
+        paths = None
+        if old_oid:
+            paths = [delta.new_file.path for delta in repo.diff(repo.get(old_oid).peel(pygit2.Tree), new_tree).deltas]
+        pointers = GinderLfs.pointers(repo, new_tree, paths)
+        GinderLfs.download(repo, list(pointers), token)
+        return pointers
+
+    @staticmethod
+    def rehydrate(repo, paths:list[str]):
+        '''Replaces pointer files in the working tree by their (meanwhile downloaded) content.'''
+        import pygit2
+        if not paths:
+            return
+        for path in paths:
+            try:
+                os.remove(os.path.join(repo.workdir, path))
+            except FileNotFoundError:
+                pass
+        repo.checkout_head(strategy=pygit2.enums.CheckoutStrategy.FORCE, paths=paths)
+
+
+#######################################################################################################
+#
+#  RESUMABLE PUSH
+#
+#######################################################################################################
+
+class GinderPush:
+    '''Pushes the commits the remote does not have yet in batches of about batch_bytes. Each batch ends at an intermediate
+       commit on the first-parent chain, so a failed attempt keeps the batches that already made it, and the next
+       attempt (or the next push by the user) resumes from the remote-tracking ref. Failures are classified; transient
+       ones (connection lost, timeouts, 5xx) are retried with bounded exponential backoff. Every attempt is logged with
+       its timing to .git/ginder/push-log.jsonl.
+    '''
+    TRANSIENT = 'transient'
+    REJECTED = 'rejected'
+    AUTH = 'auth'
+    CANCELLED = 'cancelled'
+    FATAL = 'fatal'
+
+    max_attempts: int = 5
+    base_delay: float = 2.0
+    max_delay: float = 60.0
+    batch_bytes: int = 64 << 20
+    batch_ref: str = 'refs/ginder/push-batch'
+    log_filename: str = 'push-log.jsonl'
+    log_entries: int = 500
+
+    # Lower case fragments of the libgit2 (1.9) error messages for a lost or refused connection. Only these are retried.
+    # Certificate and TLS verification failures must not be: retrying cannot fix them.
+    transient_messages = ('failed to connect to', 'failed to resolve address for', 'error receiving data from socket',
+                          'could not read from socket', 'could not write to socket', 'could not read from remote repository',
+                          'early eof', 'unexpected eof', 'ssl error: connection failure', 'ssl error: syscall failure',
+                          'unexpected http status code: 5', 'unexpected http status code: 429')
+    rejected_messages = ('not present locally', 'non-fast-forward', 'hook declined', 'rejected')
+    auth_messages = ('authentication', 'credentials', 'unexpected http status code: 401', 'unexpected http status code: 403')
+    fatal_messages = ('certificate', 'x509')
+
+    @staticmethod
+    def classify(ex:Exception) -> str:
+        if isinstance(ex, TransferCancelled):
+            return GinderPush.CANCELLED
+        if isinstance(ex, PushRejected):
+            return GinderPush.REJECTED
+        import pygit2
+        import requests
+        import ssl
+        if isinstance(ex, pygit2.AuthError):
+            return GinderPush.AUTH
+        if isinstance(ex, (pygit2.CertificateError, requests.exceptions.SSLError, ssl.SSLError)):
+            return GinderPush.FATAL
+        if isinstance(ex, requests.HTTPError) and ex.response is not None:
+            status = ex.response.status_code
+            if status in (401, 403):
+                return GinderPush.AUTH
+            return GinderPush.TRANSIENT if status >= 500 or status == 429 else GinderPush.FATAL
+        if isinstance(ex, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+            return GinderPush.TRANSIENT
+        message = str(ex).lower()
+        if any(fragment in message for fragment in GinderPush.fatal_messages):
+            return GinderPush.FATAL
+        if any(fragment in message for fragment in GinderPush.rejected_messages):
+            return GinderPush.REJECTED
+        if any(fragment in message for fragment in GinderPush.auth_messages):
+            return GinderPush.AUTH
+        if isinstance(ex, pygit2.GitError) and any(fragment in message for fragment in GinderPush.transient_messages):
+            return GinderPush.TRANSIENT
+        return GinderPush.FATAL
+
+    @staticmethod
+    def describe(ex:Exception) -> str:
+        match GinderPush.classify(ex):
+            case GinderPush.TRANSIENT:
+                return f'The connection failed ({ex}). What was pushed so far is kept, push again to resume.'
+            case GinderPush.REJECTED:
+                return f'The remote rejected the push ({ex}). Pull the remote changes first.'
+            case GinderPush.AUTH:
+                return f'Not authorized ({ex}). Check your GitHub access.'
+        return str(ex)
+
+    @staticmethod
+    def delay(attempt:int) -> float:
+        '''Seconds to wait before retrying after the given (1-based) failed attempt, with jitter.'''
+        return min(GinderPush.base_delay * (2 ** (attempt - 1)), GinderPush.max_delay) * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def commit_size(repo, commit) -> int:
+        '''Estimates the bytes a commit adds to a push: the changed blobs and the LFS content they point to.'''
+        import pygit2
+        if commit.parents:
+            deltas = [delta for delta in repo.diff(commit.parents[0].tree, commit.tree).deltas if delta.status != pygit2.enums.DeltaStatus.DELETED]
+            paths = [delta.new_file.path for delta in deltas]
+            size = sum(repo.odb.read_header(delta.new_file.id)[1] for delta in deltas)
+        else:
+            paths = None
+            size = sum(repo.odb.read_header(entry.id)[1] for entry in GinderPush.tree_blobs(commit.tree))
+        return size + sum(pointer.size for pointer in GinderLfs.pointers(repo, commit.tree, paths))
+
+    @staticmethod
+    def tree_blobs(tree):
+        import pygit2
+        for entry in tree:
+            if entry.type == pygit2.enums.ObjectType.TREE:
+                yield from GinderPush.tree_blobs(entry)
+            elif entry.type == pygit2.enums.ObjectType.BLOB:
+                yield entry
+
+    @staticmethod
+    def batches(repo, local_oid, remote_oid) -> list[tuple]:
+        '''Splits the commits between remote_oid (None: all) and local_oid into batches. Returns [(last_commit_oid, bytes)].
+           Only commits on the first-parent chain descending from remote_oid can end a batch, pushing them is a fast-forward.'''
+        import pygit2
+        chain = set()
+        commit = repo.get(local_oid)
+        while commit and commit.id != remote_oid:
+            chain.add(commit.id)
+            commit = commit.parents[0] if commit.parents else None
+        if remote_oid and not commit:
+            chain = set()       # remote_oid is not on the first-parent chain, push everything at once
+
+        walker = repo.walk(local_oid, pygit2.enums.SortMode.TOPOLOGICAL | pygit2.enums.SortMode.REVERSE)
+        if remote_oid:
+            walker.hide(remote_oid)
+        batches = []
+        size = 0
+        for commit in walker:
+            size += GinderPush.commit_size(repo, commit)
+            if size >= GinderPush.batch_bytes and commit.id in chain and commit.id != local_oid:
+                batches.append((commit.id, size))
+                size = 0
+        batches.append((local_oid, size))
+        return batches
+
+    @staticmethod
+    def log(repo, entry:dict):
+        path = os.path.join(repo.path, 'ginder', GinderPush.log_filename)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            lines = []
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()[-(GinderPush.log_entries - 1):]
+            lines.append(json.dumps(entry) + '\n')
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(path + '.tmp', path)
+        except OSError as ex:
+            print(f'Ginder: could not write push log: {str(ex)}')
+
+    @staticmethod
+    def push_batch(repo, remote, oid, branch_ref:str, tracking_ref:str, remote_oid, token:str):
+        import pygit2
+        credentials = pygit2.UserPass(token, 'x-oauth-basic')
+        # LFS objects must be on the server before the commits pointing to them. The LFS server only asks for
+        # objects it does not have, so this part resumes by itself.
+        GinderLfs.push_objects(repo, oid, remote_oid, token)
+        GinderTransfer.restart()
+        if oid == repo.references[branch_ref].target:
+            remote.push([branch_ref], callbacks=GinderTransfer.callbacks(credentials))
+        else:
+            # libgit2 can only push references, not commit ids
+            repo.references.create(GinderPush.batch_ref, oid, force=True)
+            try:
+                remote.push([f'{GinderPush.batch_ref}:{branch_ref}'], callbacks=GinderTransfer.callbacks(credentials))
+            finally:
+                repo.references.delete(GinderPush.batch_ref)
+        repo.references.create(tracking_ref, oid, force=True)
+
+    @staticmethod
+    def run(repo, remote, token:str, max_attempts:int = 1):
+        '''Pushes the current branch of repo to remote, batch by batch. Each batch gets max_attempts attempts of its own.
+           Raises the last error if a batch runs out of attempts, or right away if the failure is not transient.'''
+        branch_ref = repo.head.name
+        tracking_ref = f'refs/remotes/{remote.name}/{repo.head.shorthand}'
+        local_oid = repo.head.target
+        remote_ref = repo.references.get(tracking_ref)
+        remote_oid = remote_ref.target if remote_ref else None
+        if remote_oid == local_oid:
+            return
+        batches = GinderPush.batches(repo, local_oid, remote_oid)
+        for number, (oid, size) in enumerate(batches, 1):
+            if len(batches) > 1:
+                GinderTransfer.operation = f'Pushing batch {number}/{len(batches)} to {remote.name}'
+            attempt = 0
+            while True:
+                attempt += 1
+                started = time.time()
+                outcome = 'ok'
+                error = None
+                try:
+                    GinderPush.push_batch(repo, remote, oid, branch_ref, tracking_ref, remote_oid, token)
+                    remote_oid = oid
+                except Exception as ex:
+                    outcome = GinderPush.classify(ex)
+                    error = ex
+                finally:
+                    seconds = time.time() - started
+                    GinderPush.log(repo, {'time': started, 'batch': number, 'batches': len(batches), 'attempt': attempt, 'commit': str(oid),
+                                          'bytes': size, 'seconds': round(seconds, 3), 'outcome': outcome, 'error': str(error) if error else None})
+                    print(f'Ginder: push batch {number}/{len(batches)}, attempt {attempt} ({format_bytes(size)}): {outcome} after {seconds:.1f} s')
+                if not error:
+                    break
+                if outcome != GinderPush.TRANSIENT or attempt >= max_attempts:
+                    raise error
+                delay = GinderPush.delay(attempt)
+                GinderTransfer.report(0.0, f'Connection failed, retrying in {delay:.0f} s (attempt {attempt + 1}/{max_attempts})')
+                if GinderTransfer.cancel_event.wait(delay):
+                    GinderTransfer.check()
+
+
+#######################################################################################################
+#
+#  SAVE AND PUBLISH PIPELINE
+#
+#######################################################################################################
+
+class PublishJob(NamedTuple):
+    message: str            # Commit message, empty if there is nothing to commit (push only)
+    paths: list             # Repo-relative paths to commit, None for all changes
+    push: bool
+    snapshot: bool = False  # Record the paths as a snapshot (see GinderSnapshots) instead of committing them
+    use_lfs: bool = False   # The LFS preferences, read on the main thread
+    use_chunks: bool = False
+    token: str = ''         # The GitHub token for the push, read on the main thread
+
+
+class GinderPublish:
+    '''Runs staging, commit and push of saved work in a worker thread, so the artist can continue right after saving.
+       Jobs are processed in order. The push stage only runs once the queue is empty, so consecutive publishes
+       coalesce into one push. Stage changes and errors are handed to the main thread with run_in_main_thread.
+    '''
+    jobs = queue.Queue()
+    worker: threading.Thread = None
+    lock = threading.Lock()
+    stage: str = ''
+
+    @staticmethod
+    def save_job(push:bool) -> PublishJob:
+        '''Main thread only. Saves the open file (as set up in the preferences) and returns the job publishing it.'''
+        # The commit includes everything a pending snapshot would record
+        GinderSnapshots.cancel_pending()
+        GinderSnapshots.suspended = True
+        try:
+            if bpy.data.is_dirty:
+                # Compressed .blend files differ completely after every edit: no git deltas, no shared LFS chunks
+                if GinderPreferences.get_save_mode() == 'REPOSITORY':
+                    bpy.ops.wm.save_mainfile(compress=False)
+                else:
+                    bpy.ops.wm.save_mainfile()
+        finally:
+            GinderSnapshots.suspended = False
+        commit_message = f'{bpy.context.window.workspace.name} edits on {bpy.context.object.name} in {bpy.path.basename(bpy.context.blend_data.filepath)}'
+        paths = None
+        if GinderPreferences.get_commit_scope() == 'FILE':
+            paths = GinderGit.blend_dependencies(GinderGit.work_dir)
+        return PublishJob(commit_message, paths, push, use_lfs=GinderPreferences.get_use_lfs(), use_chunks=GinderPreferences.get_use_chunks(),
+                          token=GinderPreferences.get_github_token())
+
+    @staticmethod
+    def submit(job:PublishJob):
+        '''Main thread only. Queues the job and starts the worker if it is not running.'''
+        with GinderPublish.lock:
+            GinderPublish.jobs.put(job)
+            if not GinderPublish.worker:
+                GinderPublish.worker = threading.Thread(target=GinderPublish.run, args=(GinderGit.repo_dir,), daemon=True)
+                GinderPublish.worker.start()
+        GinderPublish.set_stage('Queued')
+
+    @staticmethod
+    def busy() -> bool:
+        return GinderPublish.worker is not None
+
+    @staticmethod
+    def set_stage(stage:str):
+        GinderPublish.stage = stage
+        run_in_main_thread(tag_redraw_areas)
+
+    @staticmethod
+    def run(repo_dir:str):
+        import pygit2
+        repo = pygit2.Repository(repo_dir)
+        push = False
+        token = ''
+        while True:
+            with GinderPublish.lock:
+                try:
+                    job = GinderPublish.jobs.get_nowait()
+                except queue.Empty:
+                    job = None
+                    if not push:
+                        GinderPublish.worker = None
+                        break
+            if job:
+                token = job.token or token
+                if job.snapshot:
+                    GinderSnapshots.write(repo, job)
+                elif job.message:
+                    push = GinderPublish.commit(repo, job) and job.push or push
+                else:
+                    push = push or job.push
+            else:
+                GinderPublish.push(repo, token)
+                push = False
+        GinderPublish.set_stage('')
+
+    @staticmethod
+    def commit(repo, job:PublishJob) -> bool:
+        '''Commit stage. Returns False if the commit failed.'''
+        GinderPublish.set_stage(f'Committing {bpy.path.basename(job.paths[0]) if job.paths else "all changes"}')
+        try:
+            # Squash the snapshots into this commit. The working tree holds everything they recorded.
+            message, paths = job.message, job.paths
+            snapshot_paths, count = GinderSnapshots.pending(repo)
+            if count:
+                message += f' ({count} snapshot{"s" if count > 1 else ""})'
+                if paths is not None:
+                    paths = sorted(set(paths) | set(snapshot_paths))
+            committed = GinderGit.commit(message, paths, repo, job.use_lfs, job.use_chunks)
+            GinderSnapshots.clear(repo)
+            if not committed and not job.push:
+                run_in_main_thread(functools.partial(ShowMessageBox, f'No changes in {bpy.path.basename(job.paths[0]) if job.paths else "the repo"} or the files it uses. Set the commit scope to "All Files" to commit other changes in the repo.', 'Nothing to commit'))
+            return True
+        except Exception as ex:
+            run_in_main_thread(functools.partial(report_error, 'ERROR', f'Could not Commit to {repo.path}.\n{ex}'))
+            return False
+        finally:
+            run_in_main_thread(GinderStatus.invalidate)
+
+    @staticmethod
+    def push(repo, token:str):
+        '''Push stage, with progress in the Ginder menu. The user can cancel it there.'''
+        GinderPublish.set_stage(f'Pushing to {GinderGit.remote_reponame}')
+        GinderTransfer.begin(f'Pushing to {GinderGit.remote_reponame}')
+        try:
+            GinderGit.push(token, repo, GinderPush.max_attempts)
+        except TransferCancelled as ex:
+            print(f'Ginder: {str(ex)}')
+        except Exception as ex:
+            run_in_main_thread(functools.partial(report_error, 'ERROR', f'Could not push to {GinderGit.remote_reponame}.\n{GinderPush.describe(ex)}'))
+        finally:
+            GinderTransfer.end()
+            run_in_main_thread(GinderStatus.invalidate)
+
+
+class GinderSnapshots:
+    '''With "Snapshot on Save", every save of a file in the repo is recorded as a commit on ref. This happens outside the
+       branch and without touching the index. Saves within debounce seconds of each other collapse into one snapshot. The
+       publish worker writes it in the background, so saving never waits for git. The next commit squashes all snapshots
+       into one commit on the branch and drops them.
+    '''
+    ref: str = 'refs/ginder/snapshots'
+    debounce: float = 3.0
+    paths: set = set()          # Main thread: files saved since the last snapshot was handed to the worker
+    count: int = 0              # Snapshots the next commit will squash
+    suspended: bool = False     # Set while Ginder itself saves for a commit
+
+    @staticmethod
+    def saved():
+        '''Main thread only, called by the save_post handler.'''
+        if GinderSnapshots.suspended or not GinderGit.local_repo or not bpy.data.filepath or not GinderPreferences.get_snapshot_on_save():
+            return
+        paths = GinderGit.blend_dependencies(GinderGit.work_dir)
+        if not paths:
+            return  # Not in the repo
+        GinderSnapshots.paths.update(paths)
+        if bpy.app.timers.is_registered(GinderSnapshots.flush):
+            bpy.app.timers.unregister(GinderSnapshots.flush)
+        bpy.app.timers.register(GinderSnapshots.flush, first_interval=GinderSnapshots.debounce)
+
+    @staticmethod
+    def flush():
+        '''bpy.app.timers callback, runs debounce seconds after the last save.'''
+        if GinderSnapshots.paths and GinderGit.local_repo:
+            paths = sorted(GinderSnapshots.paths)
+            GinderPublish.submit(PublishJob(f'Snapshot of {bpy.path.basename(bpy.data.filepath)}', paths, False, snapshot=True))
+        GinderSnapshots.paths = set()
+        return None
+
+    @staticmethod
+    def cancel_pending():
+        if bpy.app.timers.is_registered(GinderSnapshots.flush):
+            bpy.app.timers.unregister(GinderSnapshots.flush)
+        GinderSnapshots.paths = set()
+
+    @staticmethod
+    def base(repo):
+        '''Returns (HEAD commit, snapshot tip) or (HEAD commit, None) if there are no snapshots on top of HEAD.'''
+        import pygit2
+        if repo.head_is_unborn:
+            return None, None
+        head = repo.head.peel(pygit2.Commit)
+        ref = repo.references.get(GinderSnapshots.ref)
+        if not ref:
+            return head, None
+        tip = ref.peel(pygit2.Commit)
+        # After a commit, pull or checkout the snapshots are obsolete
+        if tip.id == head.id or not repo.descendant_of(tip.id, head.id):
+            return head, None
+        return head, tip
+
+    @staticmethod
+    def pending(repo) -> tuple[list[str], int]:
+        '''Returns the paths the snapshots on top of HEAD changed and the number of snapshots.'''
+        head, tip = GinderSnapshots.base(repo)
+        if not tip:
+            return [], 0
+        paths = set()
+        for delta in repo.diff(head.tree, tip.tree).deltas:
+            paths.update((delta.old_file.path, delta.new_file.path))
+        walker = repo.walk(tip.id)
+        walker.hide(head.id)
+        return sorted(paths), sum(1 for _ in walker)
+
+    @staticmethod
+    def write(repo, job:PublishJob) -> bool:
+        '''Publish worker stage. Records the working tree state of job.paths as a commit on top of the snapshots.'''
+        import pygit2
+        GinderPublish.set_stage('Recording snapshot')
+        try:
+            head, tip = GinderSnapshots.base(repo)
+            if not head:
+                return False
+            parent = tip or head
+            index = pygit2.Index()
+            index.read_tree(parent.tree)
+            for path in job.paths:
+                if os.path.isfile(os.path.join(repo.workdir, path)):
+                    # Runs the LFS clean filter, like staging does
+                    with GinderLfs.storing():
+                        oid = repo.create_blob_fromworkdir(path)
+                    mode = index[path].mode if path in index else pygit2.enums.FileMode.BLOB
+                    index.add(pygit2.IndexEntry(path, oid, mode))
+                elif path in index:
+                    index.remove(path)
+            tree = index.write_tree(repo)
+            if tree == parent.tree_id:
+                return False
+            signature = pygit2.Signature(GinderGit.github_user.name, GinderGit.github_useremail)
+            oid = repo.create_commit(None, signature, signature, job.message, tree, [parent.id])
+            repo.references.create(GinderSnapshots.ref, oid, force=True)
+            GinderSnapshots.count = GinderSnapshots.pending(repo)[1]
+            return True
+        except Exception as ex:
+            print(f'Ginder: could not record snapshot: {str(ex)}')
+            return False
+        finally:
+            run_in_main_thread(tag_redraw_areas)
+
+    @staticmethod
+    def clear(repo):
+        ref = repo.references.get(GinderSnapshots.ref)
+        if ref:
+            ref.delete()
+        GinderSnapshots.count = 0
+
+
+#######################################################################################################
+#
+#  REPOSITORY STATUS SNAPSHOTS
+#
+#######################################################################################################
+
+class RepoStatus(NamedTuple):
+    '''Immutable record of the repository status. Created by the GinderStatus worker, read by the UI.'''
+    repo_dir: str = None
+    local_name: str = None
+    remote_name: str = None
+    changes: int = 0    # file changes not added to the index (see GinderGit.pending_local_changes)
+    ahead: int = 0      # commits to push
+    behind: int = 0     # commits to pull
+    updated: float = 0.0
+    generation: int = -1
+
+
+class PollToken(NamedTuple):
+    '''What the operator poll() methods need to know, derived once per redraw from a RepoStatus.'''
+    generation: int
+    status: RepoStatus
+    is_dirty: bool
+    can_commit: bool
+    can_synch: bool     # GitHub user, local and remote repo present, no uncommitted changes and the file is saved
+    can_publish: bool   # GitHub user, local and remote repo present, something to commit or push and nothing to pull
+
+
+class GinderStatus:
+    '''Computes RepoStatus snapshots in a worker thread so that menu draw and operator poll() never touch libgit2 or the network.
+       Snapshots are stamped with the generation they were computed for. The generation is bumped only by events
+       that can change the status: save_post, load_post, commit, fetch, pull and push (see invalidate()).
+    '''
+    snapshot: RepoStatus = RepoStatus()
+    token: PollToken = None
+    generation: int = 0
+    worker: threading.Thread = None
+    rerun: bool = False
+    lock = threading.Lock()
+
+    @staticmethod
+    def invalidate(worktree:bool = True):
+        '''Marks the current snapshot as outdated and computes a new one in the background.
+           Unless worktree is False, the working tree watcher re-examines the files it knows to be modified
+           (needed whenever the index may have changed).'''
+        with GinderStatus.lock:
+            GinderStatus.generation += 1
+        if worktree:
+            GinderWatch.recheck()
+        GinderStatus.request_update()
+
+    @staticmethod
+    def current() -> RepoStatus:
+        '''Returns the most recent snapshot and schedules a refresh if it is outdated. Never blocks.'''
+        snapshot = GinderStatus.snapshot
+        if snapshot.repo_dir != GinderGit.repo_dir:
+            # Snapshot belongs to a previously opened repo (or none at all)
+            snapshot = RepoStatus(repo_dir=GinderGit.repo_dir, local_name=GinderGit.local_reponame, remote_name=GinderGit.remote_reponame)
+            GinderStatus.request_update()
+        elif snapshot.generation != GinderStatus.generation:
+            GinderStatus.request_update()
+        return snapshot
+
+    @staticmethod
+    def poll_token() -> PollToken:
+        '''Returns the PollToken shared by all poll() calls of one redraw. It is only re-derived if the snapshot
+           or the file's dirty state changed since the last call.'''
+        status = GinderStatus.current()
+        is_dirty = bpy.data.is_dirty
+        token = GinderStatus.token
+        if token and token.status is status and token.is_dirty == is_dirty and token.generation == GinderStatus.generation:
+            return token
+
+        has_remote = bool(GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo)
+        token = PollToken(
+            generation = GinderStatus.generation,
+            status = status,
+            is_dirty = is_dirty,
+            can_commit = bool(GinderGit.local_repo and (status.changes > 0 or is_dirty)),
+            can_synch = has_remote and status.changes == 0 and not is_dirty,
+            can_publish = has_remote and status.behind == 0 and (status.changes > 0 or is_dirty or status.ahead > 0))
+        GinderStatus.token = token
+        return token
+
+    @staticmethod
+    def request_update():
+        '''Starts the status worker. If it is already running, it will run once more after finishing.'''
+        with GinderStatus.lock:
+            if GinderStatus.worker and GinderStatus.worker.is_alive():
+                GinderStatus.rerun = True
+                return
+            GinderStatus.rerun = False
+            GinderStatus.worker = threading.Thread(target=GinderStatus.update, daemon=True)
+            GinderStatus.worker.start()
+
+    @staticmethod
+    def update():
+        while True:
+            generation = GinderStatus.generation
+            try:
+                snapshot = GinderStatus.compute()._replace(generation=generation)
+            except Exception as ex:
+                print(f'Ginder: could not compute repository status: {str(ex)}')
+                snapshot = RepoStatus(repo_dir=GinderGit.repo_dir, local_name=GinderGit.local_reponame, remote_name=GinderGit.remote_reponame, updated=time.time(), generation=generation)
+            GinderStatus.snapshot = snapshot
+            run_in_main_thread(tag_redraw_areas)
+            with GinderStatus.lock:
+                if not GinderStatus.rerun:
+                    return
+                GinderStatus.rerun = False
+
+    @staticmethod
+    def compute() -> RepoStatus:
+        '''Performs the actual (slow) status computation. Runs in the worker thread on a private repository object.'''
+        repo_dir = GinderGit.repo_dir
+        local_name = GinderGit.local_reponame
+        remote_name = GinderGit.remote_reponame
+        if not (repo_dir and GinderGit.local_repo):
+            return RepoStatus(repo_dir=repo_dir, local_name=local_name, remote_name=remote_name, updated=time.time())
+
+        # libgit2 repository objects must not be shared between threads
+        import pygit2
+        repo = pygit2.Repository(repo_dir)
+        changes = GinderWatch.changes(repo_dir)
+        if changes is None:
+            # The watcher is not (yet) up. Fall back to a full scan.
+            changes = GinderGit.pending_local_changes(repo)
+        ahead, behind = 0, 0
+        if GinderGit.github_user and GinderGit.remote_repo:
+            # Only compares local refs. Fetching is up to GinderFetch which requests a new snapshot when the remote moved.
+            ahead, behind = GinderGit.pending_synch_changes(repo)
+        return RepoStatus(repo_dir, local_name, remote_name, changes, ahead, behind, time.time())
+
+
+#######################################################################################################
+#
+#  WORKING TREE CHANGE TRACKING
+#
+#######################################################################################################
+
+class Inotify:
+    '''Minimal ctypes binding to the Linux inotify API watching a whole directory tree.'''
+    IN_MODIFY       = 0x00000002
+    IN_ATTRIB       = 0x00000004
+    IN_CLOSE_WRITE  = 0x00000008
+    IN_MOVED_FROM   = 0x00000040
+    IN_MOVED_TO     = 0x00000080
+    IN_CREATE       = 0x00000100
+    IN_DELETE       = 0x00000200
+    IN_DELETE_SELF  = 0x00000400
+    IN_MOVE_SELF    = 0x00000800
+    IN_Q_OVERFLOW   = 0x00004000
+    IN_IGNORED      = 0x00008000
+    IN_ISDIR        = 0x40000000
+    IN_NONBLOCK     = 0o4000
+    IN_CLOEXEC      = 0o2000000
+
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    event_header = struct.Struct('iIII')
+
+    def __init__(self, root:str, skip_dir):
+        '''Raises OSError if inotify is not available or runs out of watches (see /proc/sys/fs/inotify/max_user_watches).'''
+        if platform.system() != 'Linux':
+            raise OSError('inotify is only available on Linux')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(Inotify.IN_NONBLOCK | Inotify.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.root = root
+        self.skip_dir = skip_dir
+        self.dirs = {}  # watch descriptor -> directory path relative to root ('' for root)
+        try:
+            self.add_tree('')
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def add_tree(self, reldir:str) -> list[str]:
+        '''Watches reldir and all its subdirectories. Returns the files found below reldir.'''
+        files = []
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, reldir)):
+            rel = os.path.relpath(dirpath, self.root).replace('\\', '/')
+            rel = '' if rel == '.' else rel
+            dirnames[:] = [d for d in dirnames if not self.skip_dir(f'{rel}/{d}' if rel else d)]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), Inotify.mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {dirpath}')
+            self.dirs[wd] = rel
+            files += [f'{rel}/{f}' if rel else f for f in filenames]
+        return files
+
+    def read(self, timeout:float) -> tuple[set, bool]:
+        '''Waits up to timeout seconds for events. Returns the touched file paths and whether a full rescan is needed.'''
+        touched = set()
+        rescan = False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return touched, rescan
+        try:
+            buf = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return touched, rescan
+
+        pos = 0
+        while pos < len(buf):
+            wd, mask, _, length = Inotify.event_header.unpack_from(buf, pos)
+            pos += Inotify.event_header.size
+            name = buf[pos:pos+length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            pos += length
+
+            if mask & Inotify.IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            if mask & Inotify.IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            reldir = self.dirs.get(wd)
+            if reldir is None or not name:
+                continue
+            path = f'{reldir}/{name}' if reldir else name
+            if mask & Inotify.IN_ISDIR:
+                if self.skip_dir(path):
+                    continue
+                if mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                    touched.update(self.add_tree(path))
+                elif mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                    # We don't know which tracked files vanished with the directory
+                    rescan = True
+            else:
+                touched.add(path)
+        return touched, rescan
+
+
+class GinderWatch:
+    '''Tracks the modified files in the working tree of the current repo incrementally, so that the number of pending
+       local changes costs O(changed files) instead of a full diff_to_workdir() scan. Uses inotify on Linux. Elsewhere
+       (or when inotify runs out of watches) it falls back to polling modification times in the watcher thread.
+    '''
+    poll_period: float = 2.0
+    settle_time: float = 0.25   # Collect events for this long before re-examining the touched files
+
+    repo_dir: str = None
+    dirty: frozenset = None     # Paths (relative to the working tree) with unstaged changes. None until the first scan is done.
+    touched: set = set()
+    rescan: bool = False
+    stop_event: threading.Event = None
+    worker: threading.Thread = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def start(repo_dir:str):
+        GinderWatch.stop()
+        GinderWatch.repo_dir = repo_dir
+        GinderWatch.dirty = None
+        GinderWatch.touched = set()
+        GinderWatch.rescan = True
+        GinderWatch.stop_event = threading.Event()
+        GinderWatch.worker = threading.Thread(target=GinderWatch.run, args=(repo_dir, GinderWatch.stop_event), daemon=True)
+        GinderWatch.worker.start()
+
+    @staticmethod
+    def stop():
+        with GinderWatch.lock:
+            if GinderWatch.stop_event:
+                GinderWatch.stop_event.set()
+            GinderWatch.stop_event = None
+            GinderWatch.worker = None
+            GinderWatch.repo_dir = None
+            GinderWatch.dirty = None
+
+    @staticmethod
+    def changes(repo_dir:str) -> int:
+        '''Returns the number of files with unstaged changes or None if repo_dir is not watched (yet).'''
+        dirty = GinderWatch.dirty
+        if repo_dir != GinderWatch.repo_dir or dirty is None:
+            return None
+        return len(dirty)
+
+    @staticmethod
+    def recheck():
+        '''Re-examines all files known to be modified. Call this after the index changed (e.g. after a commit).'''
+        with GinderWatch.lock:
+            if GinderWatch.dirty:
+                GinderWatch.touched.update(GinderWatch.dirty)
+
+    @staticmethod
+    def mtimes(root:str, skip_dir) -> dict:
+        result = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel = os.path.relpath(dirpath, root).replace('\\', '/')
+            rel = '' if rel == '.' else rel
+            dirnames[:] = [d for d in dirnames if not skip_dir(f'{rel}/{d}' if rel else d)]
+            for f in filenames:
+                try:
+                    st = os.stat(os.path.join(dirpath, f))
+                except OSError:
+                    continue
+                result[f'{rel}/{f}' if rel else f] = (st.st_mtime_ns, st.st_size)
+        return result
+
+    @staticmethod
+    def run(repo_dir:str, stop_event:threading.Event):
+        import pygit2
+        wt_flags = pygit2.enums.FileStatus.WT_MODIFIED | pygit2.enums.FileStatus.WT_DELETED | pygit2.enums.FileStatus.WT_TYPECHANGE | pygit2.enums.FileStatus.WT_RENAMED
+
+        # libgit2 repository objects must not be shared between threads
+        repo = pygit2.Repository(repo_dir)
+        root = repo.workdir
+        skip_dir = lambda path: path == '.git' or path.startswith('.git/') or not GinderSparse.includes_dir(path) or repo.path_is_ignored(path + '/')
+        try:
+            inotify = Inotify(root, skip_dir)
+            mtimes = None
+        except Exception as ex:
+            print(f'Ginder: watching {root} by polling ({str(ex)})')
+            inotify = None
+            mtimes = GinderWatch.mtimes(root, skip_dir)
+
+        try:
+            while not stop_event.is_set():
+                if GinderWatch.dirty is None:
+                    # Initial full scan
+                    touched, rescan = set(), True
+                elif inotify:
+                    touched, rescan = inotify.read(GinderWatch.poll_period)
+                    if touched or rescan:
+                        # Let event bursts (e.g. Blender writing a .blend) settle
+                        stop_event.wait(GinderWatch.settle_time)
+                        more, more_rescan = inotify.read(0)
+                        touched |= more
+                        rescan |= more_rescan
+                else:
+                    stop_event.wait(GinderWatch.poll_period)
+                    current = GinderWatch.mtimes(root, skip_dir)
+                    touched = {path for path in current.keys() | mtimes.keys() if current.get(path) != mtimes.get(path)}
+                    rescan = False
+                    mtimes = current
+
+                with GinderWatch.lock:
+                    touched |= GinderWatch.touched
+                    rescan |= GinderWatch.rescan
+                    GinderWatch.touched = set()
+                    GinderWatch.rescan = False
+                if not (touched or rescan) or stop_event.is_set():
+                    continue
+
+                previous = GinderWatch.dirty
+                if rescan or previous is None:
+                    dirty = {path for path, flags in repo.status(untracked_files='no').items() if flags & wt_flags and GinderSparse.includes(path)}
+                else:
+                    dirty = set(previous)
+                    for path in touched:
+                        try:
+                            flags = repo.status_file(path)
+                        except KeyError:
+                            flags = 0   # Neither tracked nor present in the working tree
+                        if flags & wt_flags and GinderSparse.includes(path):
+                            dirty.add(path)
+                        else:
+                            dirty.discard(path)
+
+                with GinderWatch.lock:
+                    if stop_event.is_set():
+                        break
+                    GinderWatch.dirty = frozenset(dirty)
+                if previous is None or len(previous) != len(dirty):
+                    run_in_main_thread(functools.partial(GinderStatus.invalidate, False))
+        except Exception as ex:
+            print(f'Ginder: stopped watching {root}: {str(ex)}')
+            with GinderWatch.lock:
+                if not stop_event.is_set():
+                    GinderWatch.dirty = None
+        finally:
+            if inotify:
+                inotify.close()
+
+
+#######################################################################################################
+#
+#  BACKGROUND FETCH SCHEDULER
+#
+#######################################################################################################
+
+class GinderFetch:
+    '''Fetches from the remote in a worker thread. Concurrent requests join the fetch already in flight.
+       The fetch period grows while the remote is quiet and while the user is not working in Blender, and
+       snaps back to min_period as soon as remote refs move.
+    '''
+    min_period: float = 15.0
+    max_period: float = 300.0
+    backoff: float = 1.5
+    idle_after: float = 120.0       # Seconds without UI activity after which Blender is considered to be in the background
+    idle_factor: float = 4.0        # Fetch period multiplier while Blender is in the background
+    tick_period: float = 5.0
+
+    period: float = min_period
+    last_fetch_time: float = 0.0
+    last_activity: float = 0.0
+    worker: threading.Thread = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def reset():
+        GinderFetch.period = GinderFetch.min_period
+        GinderFetch.last_fetch_time = 0.0
+
+    @staticmethod
+    @persistent
+    def note_activity(*args):
+        '''Called on user activity (opening the Ginder menu, depsgraph updates, saves). Must stay cheap.
+           Not from draw_ginder_menu: the TOPBAR label is redrawn by the UIUpdate pulse, not by the user.'''
+        GinderFetch.last_activity = time.time()
+
+    @staticmethod
+    def current_period() -> float:
+        if time.time() - GinderFetch.last_activity > GinderFetch.idle_after:
+            return min(GinderFetch.period * GinderFetch.idle_factor, GinderFetch.max_period * GinderFetch.idle_factor)
+        return GinderFetch.period
+
+    @staticmethod
+    def request(force:bool = False) -> bool:
+        '''Starts a background fetch if one is due (or force is set). Returns immediately. If a fetch is
+           already in flight, the request is satisfied by that fetch.'''
+        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo):
+            return False
+        with GinderFetch.lock:
+            if GinderFetch.worker and GinderFetch.worker.is_alive():
+                return True
+            if not force and time.time() - GinderFetch.last_fetch_time < GinderFetch.current_period():
+                return False
+            GinderFetch.last_fetch_time = time.time()
+            remote = GinderGit.remote_repo
+            GinderFetch.worker = threading.Thread(target=GinderFetch.run, args=(GinderGit.repo_dir, remote.name, remote.url, GinderGit.default_branch or 'main',
+                                                                                GinderPreferences.get_github_token()), daemon=True)
+            GinderFetch.worker.start()
+        return True
+
+    @staticmethod
+    def remote_refs(repo, remote_name:str) -> dict:
+        prefix = f'refs/remotes/{remote_name}/'
+        return {name: repo.references[name].target for name in repo.references if name.startswith(prefix)}
+
+    @staticmethod
+    def run(repo_dir:str, remote_name:str, remote_url:str, branch:str, token:str):
+        try:
+            # libgit2 repository objects must not be shared between threads
+            import pygit2
+            repo = pygit2.Repository(repo_dir)
+            before = GinderFetch.remote_refs(repo, remote_name)
+            GinderGit.fetch(repo, token=token)
+            after = GinderFetch.remote_refs(repo, remote_name)
+            moved = after != before
+            remote_head = after.get(f'refs/remotes/{remote_name}/{branch}')
+            if remote_head:
+                GinderRepoMeta.update(remote_url, remote_head=str(remote_head))
+        except Exception as ex:
+            print(f'Ginder: background fetch failed: {str(ex)}')
+            moved = False
+
+        if moved:
+            GinderFetch.period = GinderFetch.min_period
+            run_in_main_thread(GinderFetch.remote_moved)
+        else:
+            GinderFetch.period = min(GinderFetch.period * GinderFetch.backoff, GinderFetch.max_period)
+
+    @staticmethod
+    def remote_moved():
+        # Only the snapshot computation knows about ahead/behind. It will redraw the menus when done.
+        GinderStatus.invalidate()
+
+    @staticmethod
+    def tick():
+        '''bpy.app.timers callback. Never touches the network itself.'''
+        GinderFetch.request()
+        return GinderFetch.tick_period
+
+    @staticmethod
+    def install():
+        if not bpy.app.timers.is_registered(GinderFetch.tick):
+            bpy.app.timers.register(GinderFetch.tick, first_interval=GinderFetch.tick_period, persistent=True)
+        GinderState.install_handler(bpy.app.handlers.depsgraph_update_post, GinderFetch.note_activity)
+
+    @staticmethod
+    def uninstall():
+        if bpy.app.timers.is_registered(GinderFetch.tick):
+            bpy.app.timers.unregister(GinderFetch.tick)
+        if GinderFetch.note_activity in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(GinderFetch.note_activity)
+
+
+#######################################################################################################
+#
+#  BLEND FILE DEPENDENCY INDEX
+#
+#######################################################################################################
+
+def blend_references() -> list[str]:
+    '''Absolute paths of the currently open .blend file and all external files it references: linked libraries,
+       images, sounds, movie clips, caches, fonts and volumes. Packed data is skipped.'''
+    if not bpy.data.filepath:
+        return []
+    files = [bpy.data.filepath]
+    files += [bpy.path.abspath(library.filepath) for library in bpy.data.libraries]
+    for collection in (bpy.data.images, bpy.data.sounds, bpy.data.movieclips, bpy.data.cache_files, bpy.data.fonts, bpy.data.volumes):
+        for datablock in collection:
+            if getattr(datablock, 'packed_file', None) or not datablock.filepath or datablock.filepath == '<builtin>':
+                continue
+            files.append(bpy.path.abspath(datablock.filepath, library=datablock.library))
+    return files
+
+
+def repo_relative_paths(repo_dir:str, files:list[str]) -> list[str]:
+    '''Converts absolute paths to repo-relative paths with forward slashes (as git and the index use them).
+       Duplicates and files outside the repo are dropped.'''
+    paths = []
+    root = os.path.realpath(repo_dir)
+    for file in files:
+        path = os.path.relpath(os.path.realpath(file), root)
+        if path.startswith('..') or os.path.isabs(path):
+            continue
+        path = path.replace(os.sep, '/')
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+# Runs inside a background Blender (see GinderDepIndex.run). Prints one line per .blend passed after '--'.
+ginder_depgraph_script = '''
+import bpy, importlib.util, json, sys
+spec = importlib.util.spec_from_file_location('ginder_depgraph', {addon_file!r})
+ginder = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ginder)
+for blendfile in sys.argv[sys.argv.index('--') + 1:]:
+    try:
+        bpy.ops.wm.open_mainfile(filepath=blendfile, load_ui=False)
+        print('GINDER_DEPS ' + json.dumps([blendfile, ginder.blend_references()[1:]]), flush=True)
+    except Exception as ex:
+        print(f'Ginder: could not index {{blendfile}}: {{ex}}', flush=True)
+'''
+
+
+class GinderDepIndex:
+    '''Persistent dependency graph of all .blend files in a repository: the libraries, textures, sounds and caches each
+       .blend references, plus the reverse lookup ("which scenes use this texture?"). Stored in .git/ginder/depgraph.json.
+       All repo_dir arguments are the working tree (GinderGit.work_dir). The open file is re-indexed on every load and
+       save. When a repo is attached, and after a pull, the tracked .blend files that are not indexed or changed since
+       are re-indexed in the background by a single Blender process in background mode.
+    '''
+    filename: str = 'depgraph.json'
+    repo_dir: str = None
+    files: dict = None      # repo-relative .blend path -> {'mtime', 'size', 'deps': [repo-relative paths]}
+    users_of: dict = None   # repo-relative path -> set of .blend paths referencing it directly
+    current: str = None     # Repo-relative path of the open .blend file (see record_current)
+    worker: threading.Thread = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def path(repo_dir:str) -> str:
+        return os.path.join(GinderGit.git_dir(repo_dir), 'ginder', GinderDepIndex.filename)
+
+    @staticmethod
+    def load(repo_dir:str):
+        '''Makes the index of repo_dir the current one. Call with lock held.'''
+        if GinderDepIndex.repo_dir == repo_dir:
+            return
+        try:
+            with open(GinderDepIndex.path(repo_dir), 'r', encoding='utf-8') as f:
+                files = json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            files = {}
+        GinderDepIndex.repo_dir = repo_dir
+        GinderDepIndex.files = files
+        GinderDepIndex.users_of = {}
+        for blend, entry in files.items():
+            for dep in entry['deps']:
+                GinderDepIndex.users_of.setdefault(dep, set()).add(blend)
+
+    @staticmethod
+    def save():
+        '''Writes the current index. Call with lock held.'''
+        path = GinderDepIndex.path(GinderDepIndex.repo_dir)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'files': GinderDepIndex.files}, f)
+            os.replace(path + '.tmp', path)
+        except OSError as ex:
+            print(f'Ginder: could not write {path}: {str(ex)}')
+
+    @staticmethod
+    def set_entry(blend:str, deps:list[str]):
+        '''Replaces the entry for blend, keeping the reverse lookup in sync. Call with lock held.'''
+        old = GinderDepIndex.files.pop(blend, None)
+        for dep in (old['deps'] if old else []):
+            users = GinderDepIndex.users_of.get(dep)
+            if users:
+                users.discard(blend)
+                if not users:
+                    del GinderDepIndex.users_of[dep]
+        if deps is None:
+            return
+        try:
+            stat = os.stat(os.path.join(GinderDepIndex.repo_dir, blend))
+        except OSError:
+            return
+        GinderDepIndex.files[blend] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'deps': deps}
+        for dep in deps:
+            GinderDepIndex.users_of.setdefault(dep, set()).add(blend)
+
+    @staticmethod
+    def record(repo_dir:str, blend:str, deps:list[str]):
+        with GinderDepIndex.lock:
+            GinderDepIndex.load(repo_dir)
+            entry = GinderDepIndex.files.get(blend)
+            GinderDepIndex.set_entry(blend, deps)
+            if entry != GinderDepIndex.files.get(blend):
+                GinderDepIndex.save()
+
+    @staticmethod
+    def record_current():
+        '''Indexes the open .blend file from bpy.data. Must be called from the main thread.'''
+        GinderDepIndex.current = None
+        if not GinderGit.work_dir or not bpy.data.filepath:
+            return
+        paths = GinderGit.blend_dependencies(GinderGit.work_dir)
+        if paths and paths[0].endswith('.blend'):
+            GinderDepIndex.current = paths[0]
+            GinderDepIndex.record(GinderGit.work_dir, paths[0], paths[1:])
+
+    @staticmethod
+    def users(repo_dir:str, path:str) -> set[str]:
+        '''All .blend files using path, directly or through linked libraries.'''
+        return GinderDepIndex.affected(repo_dir, [path]) - {path}
+
+    @staticmethod
+    def affected(repo_dir:str, paths:list[str]) -> set[str]:
+        '''The given paths plus every .blend file that (transitively) depends on one of them.'''
+        with GinderDepIndex.lock:
+            GinderDepIndex.load(repo_dir)
+            result = set(paths)
+            todo = list(paths)
+            while todo:
+                for user in GinderDepIndex.users_of.get(todo.pop(), ()):
+                    if user not in result:
+                        result.add(user)
+                        todo.append(user)
+            return result
+
+    @staticmethod
+    def stale(repo_dir:str, blends:list[str] = None) -> list[str]:
+        '''Repo-relative paths of .blend files (all tracked ones, or only the given ones) that are not indexed or changed
+           since. Forgets deleted files (and those outside the sparse checkout profile).'''
+        everything = blends is None
+        if everything:
+            import pygit2
+            blends = [entry.path for entry in pygit2.Repository(repo_dir).index if entry.path.endswith('.blend')]
+        found = {}
+        for blend in blends:
+            try:
+                found[blend] = os.stat(os.path.join(repo_dir, blend))
+            except OSError:
+                pass
+        with GinderDepIndex.lock:
+            GinderDepIndex.load(repo_dir)
+            deleted = [blend for blend in (list(GinderDepIndex.files) if everything else blends) if blend in GinderDepIndex.files and blend not in found]
+            for blend in deleted:
+                GinderDepIndex.set_entry(blend, None)
+            if deleted:
+                GinderDepIndex.save()
+            return [blend for blend, stat in found.items()
+                    if (entry := GinderDepIndex.files.get(blend)) is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size]
+
+    @staticmethod
+    def update(repo_dir:str, blends:list[str]):
+        '''Re-indexes the given .blend files (None: all tracked ones) in the background if they are stale. Blender is
+           only started if there is a stale file. Call from the main thread.'''
+        if blends == [] or (GinderDepIndex.worker and GinderDepIndex.worker.is_alive()):
+            return
+        GinderDepIndex.worker = threading.Thread(target=GinderDepIndex.run, args=(repo_dir, blends, bpy.app.binary_path), daemon=True)
+        GinderDepIndex.worker.start()
+
+    @staticmethod
+    def run(repo_dir:str, blends:list[str], blender:str):
+        stale = GinderDepIndex.stale(repo_dir, blends)
+        if not stale or not blender:
+            return
+        script = ginder_depgraph_script.format(addon_file=os.path.abspath(__file__))
+        args = [blender, '--background', '--factory-startup', '-noaudio', '--python-expr', script, '--']
+        try:
+            result = subprocess.run(args + [os.path.join(repo_dir, blend) for blend in stale], capture_output=True, text=True, errors='replace')
+        except OSError as ex:
+            print(f'Ginder: could not start {blender} to index {repo_dir}: {str(ex)}')
+            return
+        with GinderDepIndex.lock:
+            GinderDepIndex.load(repo_dir)
+            for line in result.stdout.splitlines():
+                if line.startswith('GINDER_DEPS '):
+                    blendfile, files = json.loads(line[len('GINDER_DEPS '):])
+                    blend = repo_relative_paths(repo_dir, [blendfile])
+                    if blend:
+                        GinderDepIndex.set_entry(blend[0], repo_relative_paths(repo_dir, files))
+            GinderDepIndex.save()
+
+
+#######################################################################################################
+#
+#  SPARSE CHECKOUT PROFILES
+#
+#######################################################################################################
+
+class GinderSparse:
+    '''Sparse checkout profiles: named lists of repo folders an artist works on. Only these folders are present in the
+       working tree. Everything else stays in the index and in commits, but is neither checked out nor looked at by
+       status. libgit2 has no sparse checkout of its own, so checkouts are restricted by pathspecs and the index
+       entries outside the profile are kept at the committed versions. Stored in .git/ginder/sparse.json. All repo_dir
+       arguments are the working tree (GinderGit.work_dir).
+    '''
+    filename: str = 'sparse.json'
+    CURRENT_SHOT = 'Current Shot'       # Recomputed on activation: the folders of the open file and of everything it uses
+    MY_FOLDERS = 'My Folders'
+    always_included = ('.gitattributes', '.gitignore')
+
+    repo_dir: str = None
+    active: str = None          # None: full checkout
+    profiles: dict = {}         # name -> [repo-relative folders or files]
+    prefixes: tuple = None      # of the active profile, None: full checkout
+    pruned: tuple = None        # of the profile whose outside files were removed from the working tree and not restored yet
+
+    @staticmethod
+    def path(repo_dir:str) -> str:
+        return os.path.join(GinderGit.git_dir(repo_dir), 'ginder', GinderSparse.filename)
+
+    @staticmethod
+    def profile_prefixes(name:str) -> tuple:
+        return tuple(GinderSparse.profiles[name]) + GinderSparse.always_included
+
+    @staticmethod
+    def load(repo_dir:str):
+        if GinderSparse.repo_dir == repo_dir:
+            return
+        try:
+            with open(GinderSparse.path(repo_dir), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        GinderSparse.repo_dir = repo_dir
+        GinderSparse.profiles = data.get('profiles', {})
+        GinderSparse.active = data.get('active') if data.get('active') in GinderSparse.profiles else None
+        GinderSparse.prefixes = GinderSparse.profile_prefixes(GinderSparse.active) if GinderSparse.active else None
+        GinderSparse.pruned = tuple(data['pruned']) if data.get('pruned') else None
+
+    @staticmethod
+    def save():
+        path = GinderSparse.path(GinderSparse.repo_dir)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'active': GinderSparse.active, 'profiles': GinderSparse.profiles, 'pruned': GinderSparse.pruned}, f)
+            os.replace(path + '.tmp', path)
+        except OSError as ex:
+            print(f'Ginder: could not write {path}: {str(ex)}')
+
+    @staticmethod
+    def includes(path:str, prefixes:tuple = ...) -> bool:
+        '''True if the repo-relative file path is part of the active profile (or of the one given by prefixes).'''
+        prefixes = GinderSparse.prefixes if prefixes is ... else prefixes
+        return prefixes is None or any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+
+    @staticmethod
+    def includes_dir(path:str) -> bool:
+        '''True if the repo-relative folder is (or contains) part of the active profile.'''
+        prefixes = GinderSparse.prefixes
+        return prefixes is None or any(prefix == path or prefix.startswith(path + '/') or path.startswith(prefix + '/') for prefix in prefixes)
+
+    @staticmethod
+    def pathspecs() -> list[str]:
+        '''Pathspecs restricting checkouts and add_all() to the active profile, None for a full checkout.'''
+        return list(GinderSparse.prefixes) if GinderSparse.prefixes is not None else None
 
-                    user = GinderGit.local_repo.default_signature
-                    tree = GinderGit.local_repo.index.write_tree()
-                    commit = GinderGit.local_repo.create_commit('HEAD',
-                                                user,
-                                                user,
-                                                'Merge!',
-                                                tree,
-                                                [GinderGit.local_repo.head.target, remote_master_id])
-                    # We need to do this or git CLI will think we are still merging.
-                    GinderGit.local_repo.state_cleanup()
-                else:
-                    raise AssertionError('Unknown merge analysis result')
+    @staticmethod
+    def current_shot(repo_dir:str) -> list[str]:
+        '''The folders of the open .blend file and of all files it references. Must be called from the main thread.'''
+        folders = []
+        for path in GinderGit.blend_dependencies(repo_dir):
+            folder = path.rsplit('/', 1)[0] if '/' in path else path
+            if folder not in folders:
+                folders.append(folder)
+        return folders
 
+    @staticmethod
+    def set_profile(repo_dir:str, name:str, folders:list[str]):
+        GinderSparse.load(repo_dir)
+        GinderSparse.profiles[name] = folders
+        GinderSparse.save()
 
+    @staticmethod
+    def activate(repo, name:str):
+        '''Makes name the active profile (None or empty: full checkout) and updates the working tree.'''
+        import pygit2
+        repo_dir = repo.workdir.rstrip('/\\')
+        GinderSparse.load(repo_dir)
+        if name == GinderSparse.CURRENT_SHOT:
+            GinderSparse.profiles[name] = GinderSparse.current_shot(repo_dir)
+        GinderSparse.active = name if name in GinderSparse.profiles else None
+        GinderSparse.prefixes = GinderSparse.profile_prefixes(name) if GinderSparse.active else None
+        GinderSparse.save()
+
+        # Bring in what the profile adds, then remove what it leaves out
+        repo.checkout_head(strategy=pygit2.enums.CheckoutStrategy.SAFE | pygit2.enums.CheckoutStrategy.RECREATE_MISSING, paths=GinderSparse.pathspecs())
+        # Recorded before pruning: until a full checkout brought the files back, keep_pruned() must know about them
+        GinderSparse.pruned = GinderSparse.prefixes
+        GinderSparse.save()
+        GinderSparse.prune(repo)
 
     @staticmethod
-    def pending_local_changes() -> int:
-        '''Returns the number of changes on the local git repository (file changes not added to the index and/or not committed)'''
-        if not GinderGit.local_repo:
-            return 0
+    def keep_pruned(repo, index):
+        '''Undoes the deletions add_all() staged for files outside the recorded profile. These files are missing from the
+           working tree because they were pruned, not because the artist deleted them.'''
+        import pygit2
+        prefixes = GinderSparse.prefixes or GinderSparse.pruned
+        if prefixes is None or repo.head_is_unborn:
+            return
+        tree = repo.head.peel(pygit2.Commit).tree
+        for delta in index.diff_to_tree(tree).deltas:
+            path = delta.old_file.path
+            if delta.status == pygit2.enums.DeltaStatus.DELETED and not GinderSparse.includes(path, prefixes):
+                entry = tree[path]
+                index.add(pygit2.IndexEntry(path, entry.id, entry.filemode))
 
-        index = GinderGit.local_repo.index
-        index.read()
-        return len(index.diff_to_workdir())
+    @staticmethod
+    def prune(repo):
+        '''Removes the unmodified files outside the active profile from the working tree. Files with changes and the
+           open .blend file are kept.'''
+        if GinderSparse.prefixes is None:
+            return
+        root = repo.workdir
+        current = os.path.realpath(bpy.data.filepath) if bpy.data.filepath else None
+        folders = set()
+        repo.index.read()
+        for entry in repo.index:
+            path = entry.path
+            if GinderSparse.includes(path):
+                continue
+            filepath = os.path.join(root, path)
+            if not os.path.lexists(filepath) or os.path.realpath(filepath) == current:
+                continue
+            try:
+                if repo.status_file(path) != 0:
+                    continue
+            except KeyError:
+                continue
+            os.remove(filepath)
+            folders.add(os.path.dirname(filepath))
+        # Remove folders left empty, deepest first
+        for folder in sorted(folders, key=len, reverse=True):
+            while folder and os.path.normpath(folder) != os.path.normpath(root):
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    break
+                folder = os.path.dirname(folder)
 
     @staticmethod
-    def pending_synch_changes() -> tuple[int, int]:
-        '''Returns the number of ahead and behind commits of the local HEAD compared to the remote HEAD (origin).
-           The first int of the returned tuple ist the number of commits the local branch is AHEAD of the 
-           remote branch - the number of changes that need to be pushed to the remote repo.
-           The second int of the returned tuple ist the number of commits the local branch is BEHIND the
-           remote branch - the number of changes that need to be pulled from the remote repo.
-        '''
-        # From answer 3 in https://stackoverflow.com/questions/19930935/how-to-calculate-ahead-or-behind-branchs
-        if not GinderGit.local_repo:
-            raise Exception('pending_synch_changes() called without local repository')
+    def restore(repo, paths:list[str]):
+        '''Checks out the given files from HEAD where they are missing because they are outside the active profile.'''
+        import pygit2
+        outside = [path for path in paths if not GinderSparse.includes(path)]
+        if outside:
+            repo.checkout_head(strategy=pygit2.enums.CheckoutStrategy.SAFE | pygit2.enums.CheckoutStrategy.RECREATE_MISSING, paths=outside)
 
-        upstream_head = GinderGit.local_repo.revparse_single('origin/HEAD')
-        local_head    = GinderGit.local_repo.revparse_single('HEAD')
-        diff = GinderGit.local_repo.ahead_behind(local_head.id, upstream_head.id)
-        return diff
+    @staticmethod
+    def sync_index(repo, tree):
+        '''After a checkout restricted to the profile, moves the index entries outside the profile to tree as well
+           (without touching the working tree), so they don't show up as staged changes.'''
+        import pygit2
+        if GinderSparse.prefixes is None:
+            return
+        index = repo.index
+        outside = {}
+        todo = [('', tree)]
+        while todo:
+            prefix, subtree = todo.pop()
+            for entry in subtree:
+                path = prefix + entry.name
+                if entry.type == pygit2.enums.ObjectType.TREE:
+                    if not (GinderSparse.includes_dir(path) and GinderSparse.includes(path)):
+                        todo.append((path + '/', entry))
+                elif not GinderSparse.includes(path):
+                    outside[path] = entry
+        for entry in list(index):
+            if not GinderSparse.includes(entry.path) and entry.path not in outside:
+                index.remove(entry.path)
+        for path, entry in outside.items():
+            if path not in index or index[path].id != entry.id:
+                index.add(pygit2.IndexEntry(path, entry.id, entry.filemode))
+        index.write()
 
 
 #######################################################################################################
@@ -679,6 +3232,16 @@ class UIUpdate:
         UIUpdate.spf = 1/2 # 2 beats per second, fair enough for status updates
         UIUpdate.progress_mode = UIUpdate.REDRAW
 
+    @staticmethod
+    def set_progress(progress:float, msg:str=None):
+        '''Sets the progress to a measured value (no easing animation towards a milestone).'''
+        if msg:
+            UIUpdate.message = msg
+        UIUpdate.progress = progress
+        UIUpdate.startat = progress
+        UIUpdate.endat = progress
+        UIUpdate.speed = 0
+
     @staticmethod
     def milestone(endat:float, msg:str=None, duration:float = 3):
         if msg:
@@ -729,38 +3292,231 @@ class UIUpdate:
 #
 #######################################################################################################
 
-def install_prerequisites() -> bool:
-    check_prerequisites()
+# pip package names of the modules in ginder_prerequisite_modules
+ginder_prerequisite_packages = {'pygit2': 'pygit2', 'github': 'PyGithub', 'requests_oauthlib': 'requests-oauthlib'}
+
+# Older pips cannot install the current pygit2/cryptography wheels. Only then pip is upgraded before installing.
+ginder_min_pip_version = (21, 3)
+
+
+def pip_version() -> tuple:
+    '''Returns the version of the pip available to Blender's python as a tuple of ints, None if there is no pip.'''
+    import importlib.metadata
+    importlib.invalidate_caches()
     try:
-        n = len(ginder_prerequisites) - sum(ginder_prerequisites.values())
-        n += 1  # For Pip
-        i=1.0
-        # deprecated as of 2.91: pybin = bpy.app.binary_path_python. Instead use 
-        pybin = sys.executable
+        version = importlib.metadata.version('pip')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    return tuple(int(piece) for piece in version.split('.')[:2] if piece.isdigit())
+
+
+class PipProgress:
+    '''Turns the console output of a single "pip install" into UIUpdate progress. Resolving and downloading
+       take up to 70% (the total number of packages is not known beforehand), installing the rest.'''
+    def __init__(self, startat:float):
+        self.startat = startat
+        self.collected = 0
+
+    def line(self, line:str):
+        words = line.split()
+        if not words:
+            return
+        if words[0] == 'Collecting' and len(words) > 1:
+            self.collected += 1
+            self.resolved_progress(0.0, f'Collecting {words[1]}')
+        elif words[0] == 'Progress' and len(words) == 4 and words[2] == 'of':
+            # Emitted by --progress-bar raw (pip >= 24.1): "Progress <bytes> of <total>"
+            try:
+                self.resolved_progress(int(words[1]) / max(int(words[3]), 1))
+            except ValueError:
+                pass
+        elif line.startswith('Installing collected packages:'):
+            UIUpdate.set_progress(0.75, 'Installing ' + line.split(':', 1)[1].strip())
+        elif words[0] == 'Successfully' and len(words) > 1 and words[1] == 'installed':
+            UIUpdate.set_progress(1.0, 'Installed ' + ' '.join(words[2:]))
+
+    def resolved_progress(self, fraction:float, msg:str = None):
+        # Approach 70% with every collected package, the current download fills the step to the next one.
+        done = 1 - 0.75 ** (self.collected - 1 + fraction)
+        UIUpdate.set_progress(self.startat + (0.7 - self.startat) * done, msg)
+
+
+def run_pip(args:list, progress:PipProgress = None):
+    '''Runs pip with Blender's python, echoing its output to the console and feeding it to progress.
+       Raises an exception with pip's last output lines if pip fails.'''
+    # deprecated as of 2.91: pybin = bpy.app.binary_path_python. Instead use 
+    pybin = sys.executable
+    cmd = [pybin, '-m', 'pip'] + args
+    output = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1) as proc:
+        for line in proc.stdout:
+            line = line.rstrip()
+            output.append(line)
+            if not line.startswith('Progress '):
+                print(line)
+            if progress:
+                progress.line(line)
+    if proc.returncode != 0:
+        raise Exception(f'pip {args[0]} failed with exit status {proc.returncode}:\n' + '\n'.join(output[-3:]))
+
+
+def python_abi_tag() -> str:
+    '''Identifies the wheels Blender's python can install, e.g. "cp310-win_amd64" or "cp311-linux_x86_64".'''
+    import sysconfig
+    return f'cp{sys.version_info.major}{sys.version_info.minor}-' + sysconfig.get_platform().replace('-', '_').replace('.', '_')
+
+
+# Pinned requirements (with hashes) inside each ABI folder of a wheelhouse
+wheelhouse_requirements = 'requirements.txt'
+
+# Distributions that come with Blender's python. The wheelhouse leaves out those this Blender has, so an offline
+# install never shadows Blender's own copies with other versions.
+blender_bundled_distributions = ('requests', 'urllib3', 'certifi', 'idna', 'charset-normalizer', 'numpy')
+
+def blender_bundles(distribution:str) -> bool:
+    import importlib.metadata
+    distribution = distribution.lower().replace('_', '-')
+    if distribution not in blender_bundled_distributions:
+        return False
+    try:
+        importlib.metadata.version(distribution)
+        return True
+    except importlib.metadata.PackageNotFoundError:
+        return False
+
+def wheelhouse_abi_dir(wheelhouse:str) -> str:
+    return os.path.join(bpy.path.abspath(wheelhouse), python_abi_tag())
+
+
+def build_wheelhouse(wheelhouse:str) -> bool:
+    '''Downloads the wheels of all prerequisites (and their dependencies) for this Blender's python ABI into the
+       wheelhouse and pins them with their hashes, except for the dependencies Blender already bundles. Run this on a
+       machine with internet access. Other seats with the same Blender version can then install offline from the
+       wheelhouse (see install_prerequisites).'''
+    abi_dir = wheelhouse_abi_dir(wheelhouse)
+    try:
+        os.makedirs(abi_dir, exist_ok=True)
+        run_pip(['download', '--only-binary=:all:', '--disable-pip-version-check', '--dest', abi_dir] + list(ginder_prerequisite_packages.values()))
+
+        # Wheel file names are "{name}-{version}(-{build})?-{python}-{abi}-{platform}.whl"
+        pins = []
+        for filename in sorted(os.listdir(abi_dir)):
+            if not filename.endswith('.whl'):
+                continue
+            name, version = filename.split('-')[:2]
+            if blender_bundles(name):
+                os.remove(os.path.join(abi_dir, filename))
+                continue
+            with open(os.path.join(abi_dir, filename), 'rb') as f:
+                digest = hashlib.file_digest(f, 'sha256').hexdigest() if hasattr(hashlib, 'file_digest') else hashlib.sha256(f.read()).hexdigest()
+            pins.append(f'{name.replace("_", "-")}=={version} --hash=sha256:{digest}')
+        with open(os.path.join(abi_dir, wheelhouse_requirements), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(pins) + '\n')
+    except Exception as ex:
+        run_in_main_thread(functools.partial(report_error, 'ERROR Building Wheelhouse', f'Could not download the Ginder prerequisites to {abi_dir}\n{str(ex)}'))
+        return False
+    run_in_main_thread(functools.partial(ShowMessageBox, f'{len(pins)} packages for {python_abi_tag()} are ready in {abi_dir}', 'Wheelhouse built'))
+    return True
+
+
+def loaded_distribution_versions() -> dict:
+    '''Versions of all installed distributions that provide an already imported top-level module.'''
+    import importlib.metadata
+    loaded = {name.partition('.')[0] for name in list(sys.modules)}
+    versions = {}
+    for module, distributions in importlib.metadata.packages_distributions().items():
+        if module in loaded:
+            for distribution in distributions:
+                try:
+                    versions[distribution] = importlib.metadata.version(distribution)
+                except importlib.metadata.PackageNotFoundError:
+                    pass
+    return versions
+
+
+def activate_prerequisites(loaded_before:dict) -> bool:
+    '''Makes freshly installed prerequisites importable in the running Blender. Returns False if Blender needs to
+       restart: pip replaced a package that is already imported (the stale copy stays in memory), or a native
+       extension fails to load in-process.'''
+    import site
+    # pip may have created the user site-packages folder just now (e.g. if Blender's own folder is read-only)
+    for site_dir in site.getsitepackages() + [site.getusersitepackages()]:
+        if os.path.isdir(site_dir) and site_dir not in sys.path:
+            site.addsitedir(site_dir)
+    importlib.invalidate_caches()
+
+    try:
+        loaded_after = loaded_distribution_versions()
+    except Exception:
+        return False
+    if any(loaded_after.get(distribution, version) != version for distribution, version in loaded_before.items()):
+        return False
+
+    check_prerequisites()
+    for module in ginder_prerequisite_modules:
+        if not ginder_prerequisites[module]:
+            return False
+        try:
+            importlib.import_module(module)
+        except Exception:
+            # Don't leave a half-initialized module behind for the next attempt
+            for name in [name for name in sys.modules if name == module or name.startswith(module + '.')]:
+                del sys.modules[name]
+            return False
+    return True
 
-        UIUpdate.milestone(i/n, 'Installing/Updating pip', 2)
-        ensurepip.bootstrap()
-        subprocess.check_call([pybin, '-m', 'pip', 'install', '--upgrade', 'pip'])
-
-        if not ginder_prerequisites['pygit2']:
-            i += 1
-            UIUpdate.milestone(i/n, 'Installing pygit2', 2)
-            subprocess.check_call([pybin, '-m', 'pip', 'install', 'pygit2'])
-        if not ginder_prerequisites['github']:
-            i += 1
-            UIUpdate.milestone(i/n, 'Installing PyGithub', 2)
-            subprocess.check_call([pybin, '-m', 'pip', 'install', 'PyGithub'])
-        if not ginder_prerequisites['requests_oauthlib']:
-            i += 1
-            UIUpdate.milestone(i/n, 'Installing requests-oauthlib', 2)
-            subprocess.check_call([pybin, '-m', 'pip', 'install', 'requests-oauthlib'])
+
+def prerequisites_activated():
+    '''Continues the startup that GinderState.init() skipped while the prerequisites were missing: validates a
+       stored token and attaches to the repo of the open file. Runs in the main thread.'''
+    # Attach first: check_and_open_repo() refuses to run while the token is being validated
+    if bpy.data.filepath:
+        GinderGit.check_and_open_repo(bpy.data.filepath)
+    GinderState.init()
+
+
+def install_prerequisites(wheelhouse:str = '') -> bool:
+    '''Installs the missing prerequisites from PyPI or, if wheelhouse is given, offline from the wheelhouse folder
+       (no index access, every file checked against the pinned hashes).'''
+    check_prerequisites()
+    try:
+        missing = [package for module, package in ginder_prerequisite_packages.items() if not ginder_prerequisites[module]]
+        loaded_before = loaded_distribution_versions()
+
+        version = pip_version()
+        if not version:
+            UIUpdate.set_progress(0.02, 'Installing pip')
+            import ensurepip
+            ensurepip.bootstrap()
+            version = pip_version()
+        if not wheelhouse and (not version or version < ginder_min_pip_version):
+            UIUpdate.set_progress(0.05, 'Updating pip')
+            run_pip(['install', '--upgrade', 'pip'])
+            version = pip_version()
+
+        # One pip run for all missing packages: a single dependency resolution, wheels from pip's cache where possible
+        args = ['install', '--prefer-binary', '--disable-pip-version-check']
+        if version and version >= (24, 1):
+            args += ['--progress-bar', 'raw']
+        if wheelhouse:
+            abi_dir = wheelhouse_abi_dir(wheelhouse)
+            requirements = os.path.join(abi_dir, wheelhouse_requirements)
+            if not os.path.isfile(requirements):
+                raise Exception(f'No wheels for {python_abi_tag()} in the wheelhouse. Use "Build Wheelhouse" with this Blender version on a machine with internet access first.')
+            # Install the complete pinned set. Already installed packages with matching versions are skipped by pip.
+            # Blender's bundled packages are not pinned (see build_wheelhouse), pip keeps the installed ones.
+            args += ['--no-index', '--find-links', abi_dir, '--require-hashes', '-r', requirements]
+            missing = []
+        UIUpdate.set_progress(0.1, 'Resolving ' + ', '.join(missing or ['wheelhouse']))
+        run_pip(args + missing, PipProgress(0.1))
     except Exception as ex:
         run_in_main_thread(functools.partial(report_error, 'ERROR Installing Ginder Prerequisites', f'Could not pip install one or more modules required by Ginder\n{str(ex)}'))
         UIUpdate.end_progress()
         return False
-    check_prerequisites()
-    if ginder_prerequisites['pygit2'] and ginder_prerequisites['github'] and ginder_prerequisites['requests_oauthlib']:
+    UIUpdate.set_progress(0.95, 'Activating prerequisites')
+    if activate_prerequisites(loaded_before):
         GinderState.state = GinderState.PREREQ_INSTALLED
+        run_in_main_thread(prerequisites_activated)
     else:
         GinderState.state = GinderState.READY_FOR_RESTART
     UIUpdate.end_progress()
@@ -777,12 +3533,27 @@ class InstallPrerequisitesOperator(bpy.types.Operator):
             return {'CANCELLED'}
 
         UIUpdate.progress_init(context.area)
-        install_prereq_thread = threading.Thread(target=install_prerequisites)
+        install_prereq_thread = threading.Thread(target=functools.partial(install_prerequisites, GinderPreferences.get_wheelhouse_dir()))
         install_prereq_thread.start()
         GinderState.state = GinderState.INSTALLING_PREREQ
         return {'FINISHED'}
 
 
+class BuildWheelhouseOperator(bpy.types.Operator):
+    """Download the python modules required by this Add-on into the wheelhouse folder, so that other computers running the same Blender version can install them without internet access"""
+    bl_idname = id_for_build_wheelhouse_operator
+    bl_label = "Build Wheelhouse"
+
+    @classmethod
+    def poll(cls, context):
+        return bool(GinderPreferences.get_wheelhouse_dir())
+
+    def execute(self, context):
+        build_wheelhouse_thread = threading.Thread(target=functools.partial(build_wheelhouse, GinderPreferences.get_wheelhouse_dir()))
+        build_wheelhouse_thread.start()
+        return {'FINISHED'}
+
+
 #######################################################################################################
 #
 #  UNINSTALL PREREQUISITES
@@ -1031,6 +3802,7 @@ class DeregisterFromGitHubOperator(bpy.types.Operator):
         global preview_collections
         if GinderState.state != GinderState.GITHUB_REGISTERED:
             return {'FINISHED'}
+        GinderHttpCache.forget(GinderPreferences.get_github_token())
         GinderPreferences.set_github_token('')
         # GinderPreferences.set_github_user('')
         try: del preview_collections['main']['the_avatar_icon'] 
@@ -1118,6 +3890,74 @@ class GinderPreferences(AddonPreferences):
         description="GitHub Access token registered by the user with the Ginder Add-on.",
     ) # type: ignore
 
+    @staticmethod
+    def get_save_mode() -> str:
+        return bpy.context.preferences.addons[id_for_addon].preferences.save_mode
+
+    save_mode: EnumProperty(
+        name="Save",
+        description="How the current file is saved before a commit",
+        items=[
+            ('REPOSITORY', 'Repository Optimized', 'Save changed files uncompressed (and keep them uncompressed). Successive revisions share most of their bytes, so the packed repository and LFS chunks stay small. Files on disk get larger'),
+            ('USER', 'As Set in File', 'Save with the compression setting of the file. Compressed files are smaller on disk, but every revision is stored in full'),
+        ],
+        default='USER',
+    ) # type: ignore
+
+    @staticmethod
+    def get_commit_scope() -> str:
+        return bpy.context.preferences.addons[id_for_addon].preferences.commit_scope
+
+    commit_scope: EnumProperty(
+        name="Commit",
+        description="Which changes in the repository a commit includes",
+        items=[
+            ('FILE', 'Current File', 'Only the saved .blend file and the files it references (libraries, images, sounds, caches, fonts). Push and pull stay unavailable while other files have uncommitted changes'),
+            ('ALL', 'All Files', 'All changes in the repository directory'),
+        ],
+        default='ALL',
+    ) # type: ignore
+
+    @staticmethod
+    def get_snapshot_on_save() -> bool:
+        return bpy.context.preferences.addons[id_for_addon].preferences.snapshot_on_save
+
+    snapshot_on_save: BoolProperty(
+        name="Snapshot on Save",
+        description="Record every save as a local snapshot in the background. The next commit squashes all snapshots into one commit, so the remote only gets one revision",
+        default=False,
+    ) # type: ignore
+
+    @staticmethod
+    def get_use_lfs() -> bool:
+        return bpy.context.preferences.addons[id_for_addon].preferences.use_lfs
+
+    use_lfs: BoolProperty(
+        name="Store Assets with Git LFS",
+        description="Add Git LFS tracking rules for .blend files, images, caches and media to the .gitattributes of a repo when committing. GitHub Pages serves LFS tracked files as pointers, and LFS storage counts against the LFS quota",
+        default=False,
+    ) # type: ignore
+
+    @staticmethod
+    def get_use_chunks() -> bool:
+        return bpy.context.preferences.addons[id_for_addon].preferences.use_chunks
+
+    use_chunks: BoolProperty(
+        name="Chunk .blend Files",
+        description="Store .blend files as content-defined chunks in LFS. Successive revisions share unchanged chunks, so only new chunks are stored and transferred. Other git LFS clients only see the chunk list",
+        default=False,
+    ) # type: ignore
+
+    @staticmethod
+    def get_wheelhouse_dir() -> str:
+        return bpy.context.preferences.addons[id_for_addon].preferences.wheelhouse_dir
+
+    wheelhouse_dir: StringProperty(
+        name="Wheelhouse",
+        description="Local or shared network folder with pre-downloaded python modules. If set, prerequisites are installed from there without internet access.",
+        subtype='DIR_PATH',
+    ) # type: ignore
+
     # @staticmethod
     # def set_github_user(user:str) -> None:
     #     bpy.context.preferences.addons[id_for_addon].preferences.github_user = user
@@ -1194,6 +4034,23 @@ class GinderPreferences(AddonPreferences):
 
         row.template_icon(icon_value = preview_collections['main']['the_ginder_icon_l'].icon_id, scale=1)
 
+        # REPOSITORY OPTIONS
+        if GinderState.state == GinderState.GITHUB_REGISTERED:
+            box = layout.box()
+            box.prop(self, 'commit_scope', expand=True)
+            box.prop(self, 'save_mode', expand=True)
+            box.prop(self, 'snapshot_on_save')
+            box.prop(self, 'use_lfs')
+            row = box.row()
+            row.enabled = self.use_lfs
+            row.prop(self, 'use_chunks')
+
+        # OFFLINE INSTALLATION
+        box = layout.box()
+        box.prop(self, 'wheelhouse_dir')
+        if GinderState.state in (GinderState.PREREQ_INSTALLED, GinderState.GITHUB_REGISTERED):
+            box.operator(id_for_build_wheelhouse_operator, icon='PACKAGE')
+
 
 #######################################################################################################
 #######################################################################################################
@@ -1240,11 +4097,21 @@ class CreateNewPresentationRepo(bpy.types.Operator):
         description="The template to use for the newly created repository"
     ) # type: ignore
 
+    history: EnumProperty(
+        items = [
+            ('SHALLOW', 'Latest Version', 'Download only the latest commit. Older history is fetched when needed'),
+            ('FULL', 'Full History', 'Download all commits of the repository'),
+        ],
+        name="History",
+        description="How much of the repository history to download",
+        default='SHALLOW',
+    ) # type: ignore
+
     # test: StringProperty(name="Worscht", description="Grobe oder feine?") # type:ignore
 
     @classmethod
     def poll(cls, context):
-        return GinderState.state == GinderState.GITHUB_REGISTERED
+        return GinderState.state == GinderState.GITHUB_REGISTERED and not GinderTransfer.active
 
     def execute(self, context):
         # print("Selected repo dir: '" + self.directory + "'")
@@ -1259,25 +4126,38 @@ class CreateNewPresentationRepo(bpy.types.Operator):
             return {'CANCELLED'}
 
         repo_name = os.path.basename(os.path.normpath(self.directory))
+        template_username, template_reponame = [('griestopf', 'FreeDee'), ('DEBUG_username', 'DEBUG_reponame')][int(self.template_repo)]
+        # Creating and cloning run in the background with progress in the Ginder menu, where the user can cancel them
+        GinderTransfer.begin(f'Creating {repo_name}', context.area)
+        create_thread = threading.Thread(target=CreateNewPresentationRepo.create, daemon=True,
+                                         args=(self.directory, repo_name, template_username, template_reponame, 1 if self.history == 'SHALLOW' else 0, GinderPreferences.get_github_token()))
+        create_thread.start()
+        return {'FINISHED'}
+
+    @staticmethod
+    def create(directory:str, repo_name:str, template_username:str, template_reponame:str, depth:int, token:str):
         try:
-            template_username, template_reponame = [('griestopf', 'FreeDee'), ('DEBUG_username', 'DEBUG_reponame')][int(self.template_repo)]
-            GinderGit.create_new_repo(repo_name, template_username, template_reponame)
-            GinderGit.enable_github_pages()
+            GinderGit.create_new_repo(repo_name, template_username, template_reponame, token)
+            GinderGit.enable_github_pages(token)
             # Wait a couple of seconds, otherwise the new GitHub repo is not completely accessible/cloneable from pygit2.
             # directly cloning after creation will lead to incomplete local versions (only .git directory. No other content)
-            time.sleep(5)
-            GinderGit.clone_repo(self.directory)
+            if GinderTransfer.cancel_event.wait(5):
+                GinderTransfer.check()
+            GinderTransfer.operation = f'Cloning {repo_name}'
+            GinderGit.clone_repo(directory, token, depth=depth)
+        except TransferCancelled as ex:
+            print(f'Ginder: {str(ex)}')
         except Exception as ex:
-            report_error('ERROR', f'Error while creating repository "{str(self.directory)}": \n{str(ex)}')
-            return {'CANCELLED'}
-
-        return {'FINISHED'}
+            run_in_main_thread(functools.partial(report_error, 'ERROR', f'Error while creating repository "{directory}": \n{str(ex)}'))
+        finally:
+            GinderTransfer.end()
 
     def draw(self, context):
         layout = self.layout
         layout.label(text='Select an empty directory')
         layout.label(text='or create one!')
         layout.prop(self, 'template_repo')
+        layout.prop(self, 'history')
 
     def invoke(self, context, event):
         # Open browser, take reference to 'self' read the path to selected
@@ -1371,18 +4251,17 @@ class CommitToRepoOperator(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        return GinderGit.local_repo and (GinderGit.pending_local_changes() > 0 or bpy.data.is_dirty)
+        return GinderStatus.poll_token().can_commit
 
     def execute(self, context):
-        if not (GinderGit.local_repo and (GinderGit.pending_local_changes() > 0 or bpy.data.is_dirty)):
+        # Decide on the status snapshot. Scanning the working tree is left to the publish worker.
+        if not GinderStatus.poll_token().can_commit:
             report_error('ERROR', 'Cannot commit to repo.')
             return {'CANCELLED'}
         try:
-            if bpy.data.is_dirty:
-                bpy.ops.wm.save_mainfile()
             print(f'Commit to {GinderGit.local_repo.path}')
-            commit_message = f'{bpy.context.window.workspace.name} edits on {bpy.context.object.name} in {bpy.path.basename(bpy.context.blend_data.filepath)}'
-            GinderGit.commit(commit_message)
+            # Staging and commit run in the background (see GinderPublish)
+            GinderPublish.submit(GinderPublish.save_job(push=False))
             return {'FINISHED'}
         except Exception as ex:
             report_error('ERROR', f'Could not Commit to {GinderGit.local_repo.path}.\n{ex}')
@@ -1402,22 +4281,22 @@ class PushToRemoteOperator(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        token = GinderStatus.poll_token()
+        if not token.can_synch or GinderTransfer.active:
             return False
-        GinderGit.refetch()
-        (topush, topull) = GinderGit.pending_synch_changes()        
+        (topush, topull) = (token.status.ahead, token.status.behind)
         return topush > 0 and topull == 0
 
     def execute(self, context):
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo):
+        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo) or GinderTransfer.active:
             report_error('ERROR', 'Cannot push changes to remote repo.')
             return {'CANCELLED'}
         try:
-            GinderGit.refetch()
+            # Compares with the refs of the last background fetch. If the remote moved since, GinderPush reports
+            # the rejected push on the worker, the main thread never waits for the network here.
             (topush, topull) = GinderGit.pending_synch_changes()
             if topush > 0:
-                GinderGit.push()
+                GinderPublish.submit(PublishJob('', None, True, token=GinderPreferences.get_github_token()))
             if topull > 0:
                 report_error('ERROR', f'Pushing to {GinderGit.remote_reponame} with {topull} pulls open.')
             return {'FINISHED'}
@@ -1426,6 +4305,37 @@ class PushToRemoteOperator(bpy.types.Operator):
             return {'CANCELLED'}
 
 
+#######################################################################################################
+#
+#  SAVE AND PUBLISH
+#
+#######################################################################################################
+
+class PublishOperator(bpy.types.Operator):
+    """Save the current file, commit the changes and push them to the remote repository. Committing and pushing run in the background, you can continue working right away"""
+    bl_idname = id_for_publish_operator
+    bl_label = "Save and Publish"
+
+    @classmethod
+    def poll(cls, context):
+        return GinderStatus.poll_token().can_publish and not GinderTransfer.active
+
+    def execute(self, context):
+        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo):
+            report_error('ERROR', 'Cannot publish to remote repo.')
+            return {'CANCELLED'}
+        try:
+            status = GinderStatus.current()
+            if bpy.data.is_dirty or status.changes > 0:
+                GinderPublish.submit(GinderPublish.save_job(push=True))
+            else:
+                GinderPublish.submit(PublishJob('', None, True, token=GinderPreferences.get_github_token()))
+            return {'FINISHED'}
+        except Exception as ex:
+            report_error('ERROR', f'Could not publish to {GinderGit.remote_reponame}.\n{ex}')
+            return {'CANCELLED'}
+
+
 #######################################################################################################
 #
 #  PULL FROM REMOTE REPO 
@@ -1439,30 +4349,51 @@ class PullFromRemoteOperator(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        token = GinderStatus.poll_token()
+        if not token.can_synch or GinderTransfer.active or GinderPublish.busy():
             return False
-        GinderGit.refetch()
-        (topush, topull) = GinderGit.pending_synch_changes()        
+        (topush, topull) = (token.status.ahead, token.status.behind)
         return topush == 0 and topull > 0
 
     def execute(self, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        if not GinderStatus.poll_token().can_synch:
             report_error('ERROR', 'Cannot pull changes from remote repo.')
             return {'CANCELLED'}
         try:
-            GinderGit.refetch()
+            # The fetch runs in the background with progress and cancel. The pull follows on the main thread and
+            # decides on the fetched refs.
+            GinderGit.fetch_then(f'Fetching from {GinderGit.remote_reponame}', PullFromRemoteOperator.pull)
+            return {'FINISHED'}
+        except Exception as ex:
+            report_error('ERROR', f'Could pull changes from {GinderGit.remote_reponame}.\n{ex}')
+            return {'CANCELLED'}
+
+    @staticmethod
+    def pull():
+        '''Main thread, after the fetch.'''
+        if bpy.data.is_dirty:
+            report_error('ERROR', f'{bpy.path.basename(bpy.data.filepath)} was changed while fetching. Save it and pull again.')
+            return
+        try:
             (topush, topull) = GinderGit.pending_synch_changes()
-            if topull > 0:
+            if topush > 0:
+                report_error('ERROR', f'Pulling from {GinderGit.remote_reponame} with {topush} pushes open. Merge instead.')
+                return
+            if topull == 0:
+                return
+            old_head = GinderGit.local_repo.head.target
+            with GinderLfs.downloading(GinderPreferences.get_github_token()):
                 GinderGit.pull(False)
+            # Only reload the open file if the pull changed it or anything it uses
+            current = GinderGit.blend_dependencies(GinderGit.work_dir)[:1]
+            changed = GinderGit.changed_paths(old_head, GinderGit.local_repo.head.target)
+            if current and current[0] in GinderDepIndex.affected(GinderGit.work_dir, changed):
                 bpy.ops.wm.revert_mainfile()
-            if topush > 0:
-                report_error('ERROR', f'Pulling from {GinderGit.remote_reponame} with {topush} pushes open.')
-            return {'FINISHED'}
+            GinderDepIndex.update(GinderGit.work_dir, [path for path in changed if path.endswith('.blend')])
         except Exception as ex:
             report_error('ERROR', f'Could pull changes from {GinderGit.remote_reponame}.\n{ex}')
-            return {'CANCELLED'}
+        finally:
+            GinderStatus.invalidate()
 
 
 #######################################################################################################
@@ -1477,30 +4408,43 @@ class MergeTheirsOperator(bpy.types.Operator):
     bl_label = "Merge Changes and Keep Remote Versions for Conflicts"
     @classmethod
     def poll(cls, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        token = GinderStatus.poll_token()
+        if not token.can_synch or GinderTransfer.active or GinderPublish.busy():
             return False
-        GinderGit.refetch()
-        (topush, topull) = GinderGit.pending_synch_changes()        
+        (topush, topull) = (token.status.ahead, token.status.behind)
         return topush > 0 and topull > 0
 
     def execute(self, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        if not GinderStatus.poll_token().can_synch:
             report_error('ERROR', 'Cannot merge changes with remote repo.')
             return {'CANCELLED'}
         try:
-            GinderGit.refetch()
+            # The fetch runs in the background with progress and cancel. The merge follows on the main thread and
+            # decides on the fetched refs.
+            GinderGit.fetch_then(f'Fetching from {GinderGit.remote_reponame}', MergeTheirsOperator.merge)
+            return {'FINISHED'}
+        except Exception as ex:
+            report_error('ERROR', f'Could merge changes with {GinderGit.remote_reponame}.\n{ex}')
+            return {'CANCELLED'}
+
+    @staticmethod
+    def merge():
+        '''Main thread, after the fetch. The push runs in the background (see GinderPublish).'''
+        if bpy.data.is_dirty:
+            report_error('ERROR', f'{bpy.path.basename(bpy.data.filepath)} was changed while fetching. Save it and merge again.')
+            return
+        try:
             (topush, topull) = GinderGit.pending_synch_changes()
             if topull > 0:
-                GinderGit.pull(True)
+                with GinderLfs.downloading(GinderPreferences.get_github_token()):
+                    GinderGit.pull(True)
                 bpy.ops.wm.revert_mainfile()
             if topush > 0:
-                GinderGit.push()
-            return {'FINISHED'}
+                GinderPublish.submit(PublishJob('', None, True, token=GinderPreferences.get_github_token()))
         except Exception as ex:
             report_error('ERROR', f'Could merge changes with {GinderGit.remote_reponame}.\n{ex}')
-            return {'CANCELLED'}
+        finally:
+            GinderStatus.invalidate()
 
 
 #######################################################################################################
@@ -1515,30 +4459,43 @@ class MergeOursOperator(bpy.types.Operator):
     bl_label = "Merge Changes and Keep Local Versions for Conflicts"
     @classmethod
     def poll(cls, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        token = GinderStatus.poll_token()
+        if not token.can_synch or GinderTransfer.active or GinderPublish.busy():
             return False
-        GinderGit.refetch()
-        (topush, topull) = GinderGit.pending_synch_changes()        
+        (topush, topull) = (token.status.ahead, token.status.behind)
         return topush > 0 and topull > 0
 
     def execute(self, context):
-        numberofchanges = GinderGit.pending_local_changes()
-        if not (GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo and numberofchanges == 0 and not bpy.data.is_dirty):
+        if not GinderStatus.poll_token().can_synch:
             report_error('ERROR', 'Cannot merge changes with remote repo.')
             return {'CANCELLED'}
         try:
-            GinderGit.refetch()
+            # The fetch runs in the background with progress and cancel. The merge follows on the main thread and
+            # decides on the fetched refs.
+            GinderGit.fetch_then(f'Fetching from {GinderGit.remote_reponame}', MergeOursOperator.merge)
+            return {'FINISHED'}
+        except Exception as ex:
+            report_error('ERROR', f'Could merge changes with {GinderGit.remote_reponame}.\n{ex}')
+            return {'CANCELLED'}
+
+    @staticmethod
+    def merge():
+        '''Main thread, after the fetch. The push runs in the background (see GinderPublish).'''
+        if bpy.data.is_dirty:
+            report_error('ERROR', f'{bpy.path.basename(bpy.data.filepath)} was changed while fetching. Save it and merge again.')
+            return
+        try:
             (topush, topull) = GinderGit.pending_synch_changes()
             if topull > 0:
-                GinderGit.pull(False)
+                with GinderLfs.downloading(GinderPreferences.get_github_token()):
+                    GinderGit.pull(False)
                 bpy.ops.wm.revert_mainfile()
             if topush > 0:
-                GinderGit.push()
-            return {'FINISHED'}
+                GinderPublish.submit(PublishJob('', None, True, token=GinderPreferences.get_github_token()))
         except Exception as ex:
             report_error('ERROR', f'Could merge changes with {GinderGit.remote_reponame}.\n{ex}')
-            return {'CANCELLED'}
+        finally:
+            GinderStatus.invalidate()
 
 
 #######################################################################################################
@@ -1559,6 +4516,110 @@ class SynchronizeMenu(bpy.types.Menu):
 
 
 
+#######################################################################################################
+#
+#  CANCEL TRANSFER
+#
+#######################################################################################################
+
+class CancelTransferOperator(bpy.types.Operator):
+    """Stop the running transfer. Everything transferred so far is kept"""
+    bl_idname = id_for_cancel_transfer_operator
+    bl_label = "Cancel"
+
+    @classmethod
+    def poll(cls, context):
+        return GinderTransfer.active and not GinderTransfer.cancel_event.is_set()
+
+    def execute(self, context):
+        GinderTransfer.cancel()
+        return {'FINISHED'}
+
+
+#######################################################################################################
+#
+#  SPARSE CHECKOUT
+#
+#######################################################################################################
+
+class SparseCheckoutOperator(bpy.types.Operator):
+    """Only keep the folders of the selected profile in the working directory. Files outside stay in the repository but are not downloaded or checked for changes"""
+    bl_idname = id_for_sparse_checkout_operator
+    bl_label = "Sparse Checkout"
+
+    profile: StringProperty(
+        name="Profile",
+        description="Sparse checkout profile to activate. Empty for the complete repository",
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return GinderGit.local_repo is not None
+
+    def execute(self, context):
+        try:
+            with GinderLfs.downloading(GinderPreferences.get_github_token()):
+                GinderSparse.activate(GinderGit.local_repo, self.profile)
+        except Exception as ex:
+            report_error('ERROR', f'Could not check out "{self.profile or "Everything"}" in {GinderGit.local_reponame}.\n{ex}')
+            return {'CANCELLED'}
+        # The watcher skips the folders outside the profile: restart it
+        GinderWatch.start(GinderGit.repo_dir)
+        GinderStatus.invalidate()
+        return {'FINISHED'}
+
+
+class SparseAddFolderOperator(bpy.types.Operator):
+    """Add a folder of the repository to your own sparse checkout profile and activate it"""
+    bl_idname = id_for_sparse_add_folder_operator
+    bl_label = "Add Folder to My Folders"
+
+    directory: StringProperty(
+        name="Folder",
+        description="Folder inside the repository to check out",
+    ) # type: ignore
+
+    filter_folder: BoolProperty(
+        default=True,
+        options={"HIDDEN"}
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return GinderGit.local_repo is not None
+
+    def execute(self, context):
+        folder = repo_relative_paths(GinderGit.work_dir, [self.directory.rstrip('/\\')])
+        if not folder or folder[0] == '.':
+            report_error('ERROR', f'"{self.directory}" is not a folder inside {GinderGit.local_reponame}.')
+            return {'CANCELLED'}
+        GinderSparse.load(GinderGit.work_dir)
+        folders = GinderSparse.profiles.get(GinderSparse.MY_FOLDERS, [])
+        if folder[0] not in folders:
+            GinderSparse.set_profile(GinderGit.work_dir, GinderSparse.MY_FOLDERS, folders + folder)
+        return bpy.ops.ginder.sparse_checkout(profile=GinderSparse.MY_FOLDERS)
+
+    def invoke(self, context, event):
+        self.directory = GinderGit.work_dir + os.sep
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+class SparseCheckoutMenu(bpy.types.Menu):
+    bl_label = 'Sparse Checkout Menu'
+    bl_idname = 'Ginder_Sparse_menu'
+
+    def draw(self, context):
+        layout = self.layout
+        active = GinderSparse.active
+        layout.operator(id_for_sparse_checkout_operator, text='Everything', icon='RADIOBUT_OFF' if active else 'RADIOBUT_ON').profile = ''
+        names = [GinderSparse.CURRENT_SHOT] + sorted(name for name in GinderSparse.profiles if name != GinderSparse.CURRENT_SHOT)
+        for name in names:
+            layout.operator(id_for_sparse_checkout_operator, text=name, icon='RADIOBUT_ON' if name == active else 'RADIOBUT_OFF').profile = name
+        layout.separator()
+        layout.operator(id_for_sparse_add_folder_operator, icon='NEWFOLDER')
+
+
 #######################################################################################################
 #
 #  File -> Ginder MENU
@@ -1571,44 +4632,76 @@ class GinderMenu(bpy.types.Menu):
 
     def draw(self, context):
         UIUpdate.start_pulse(context.area)
+        GinderFetch.note_activity()
 
         if GinderState.state == GinderState.UNDEFINED:
             GinderState.init()
 
         layout = self.layout
 
-        numberofchanges = GinderGit.pending_local_changes()
+        match GinderGit.attach_state:
+            case GinderGit.ATTACH_CONNECTING:
+                layout.label(text=f'Connecting to {GinderGit.remote_reponame or GinderGit.local_reponame or "repository"}...', icon='TIME')
+            case GinderGit.ATTACH_OFFLINE:
+                layout.label(text=f'{GinderGit.remote_reponame} on GitHub is not reachable', icon='ERROR')
+            case GinderGit.ATTACH_SIGNED_OUT:
+                layout.label(text='Not signed in to GitHub', icon='INFO')
+
+        if GinderPublish.busy() and not GinderTransfer.active:
+            layout.label(text=f'{GinderPublish.stage}...', icon='SORTTIME')
+            layout.separator()
+
+        if GinderTransfer.active:
+            layout.label(text=GinderTransfer.operation, icon='SORTTIME')
+            layout.progress(factor=UIUpdate.progress, type='BAR', text=UIUpdate.message)
+            layout.operator(id_for_cancel_transfer_operator, text=f'Cancel {GinderTransfer.operation}', icon='CANCEL')
+            layout.separator()
+
+        status = GinderStatus.current()
+        numberofchanges = status.changes
+        snapshots = f' ({GinderSnapshots.count} Snapshot{"s" if GinderSnapshots.count > 1 else ""})' if GinderSnapshots.count else ''
         if  GinderGit.local_repo and (bpy.data.is_dirty or numberofchanges > 0):
             if (bpy.data.is_dirty):
                 if numberofchanges == 0:
                     numberofchanges += 1
-                layout.operator(id_for_commit_to_repo_operator, text=f'Save and Commit {numberofchanges} Change{"s" if numberofchanges > 1 else ""} to {GinderGit.local_reponame}', icon='CHECKMARK')
+                layout.operator(id_for_commit_to_repo_operator, text=f'Save and Commit {numberofchanges} Change{"s" if numberofchanges > 1 else ""}{snapshots} to {status.local_name}', icon='CHECKMARK')
             else:
-                layout.operator(id_for_commit_to_repo_operator, text=f'Commit {numberofchanges} Change{"s" if numberofchanges > 1 else ""} to {GinderGit.local_reponame}', icon='CHECKMARK')
+                layout.operator(id_for_commit_to_repo_operator, text=f'Commit {numberofchanges} Change{"s" if numberofchanges > 1 else ""}{snapshots} to {status.local_name}', icon='CHECKMARK')
         else:
             layout.operator(id_for_commit_to_repo_operator, icon='CHECKMARK')
 
+        if GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo:
+            layout.operator(id_for_publish_operator, text=f'Save and Publish to {status.remote_name}', icon='EXPORT')
+
         # Only show the push/pull/sync menu item if there is a local repo and a remote repo and there. Show the correct option based on the ahead/behind status even if there are local changes.
         # In case of local commits or an unsaved file, the push/pull/sync options will be disabled by the respective operators' poll methods.
         if GinderGit.github_user and GinderGit.local_repo and GinderGit.remote_repo: # and numberofchanges == 0 and not bpy.data.is_dirty
-            GinderGit.refetch()
-            (topush, topull) = GinderGit.pending_synch_changes()
+            (topush, topull) = (status.ahead, status.behind)
             if topush > 0 and topull > 0:
                 # Show the sync submenu
-                text = f'Synchronize {str(topull)}↓ and {str(topush)}↑ Commits With {GinderGit.remote_reponame}'
+                text = f'Synchronize {str(topull)}↓ and {str(topush)}↑ Commits With {status.remote_name}'
                 layout.menu('Ginder_Synchronize_menu', text=text, icon='FILE_REFRESH')
             elif topull > 0:
-                text = f'Pull {str(topull)} Commit{"s" if topull > 1 else ""} From {GinderGit.remote_reponame}'
+                text = f'Pull {str(topull)} Commit{"s" if topull > 1 else ""} From {status.remote_name}'
                 layout.operator(id_for_pull_from_remote_operator, text=text, icon='SORT_ASC')
             elif topush > 0:
-                text = f'Push {str(topush)} Commit{"s" if topush > 1 else ""} To {GinderGit.remote_reponame}'
+                text = f'Push {str(topush)} Commit{"s" if topush > 1 else ""} To {status.remote_name}'
                 layout.operator(id_for_push_to_remote_operator, text=text, icon='SORT_DESC')
             else: # no changes to push or pull
-                layout.operator(id_for_push_to_remote_operator, text = f"Synchronize Changes With {GinderGit.remote_reponame}", icon='FILE_REFRESH') # should appear disabled
+                layout.operator(id_for_push_to_remote_operator, text = f"Synchronize Changes With {status.remote_name}", icon='FILE_REFRESH') # should appear disabled
         else:
             layout.operator(id_for_push_to_remote_operator, text = f"Synchronize Changes With Remote Repo", icon='FILE_REFRESH') # should appear disabled
 
 
+        if GinderGit.local_repo:
+            layout.menu('Ginder_Sparse_menu', text=f'Checkout: {GinderSparse.active or "Everything"}', icon='FILTER')
+
+        if GinderGit.local_repo and GinderDepIndex.current:
+            # Changes to a linked library show up in these scenes
+            users = sorted(os.path.basename(user) for user in GinderDepIndex.users(GinderGit.work_dir, GinderDepIndex.current))
+            if users:
+                layout.label(text=f'Used by {", ".join(users[:3])}{f" and {len(users) - 3} more" if len(users) > 3 else ""}', icon='LINKED')
+
         if GinderGit.remote_reponame:
             # layout.label(f'Repo {GinderGit.remote_reponame} on GitHub')
             layout.operator(id_for_ginder_open_repos_github_page_operator, text=f'Open {GinderGit.remote_reponame}\'s GitHub-Pages page', icon='URL')
@@ -1629,8 +4722,9 @@ class GinderMenu(bpy.types.Menu):
 
 def draw_ginder_menu(self, context):
     layout = self.layout
-    if GinderGit.local_reponame:
-        text = f'{GinderGit.local_reponame} - Ginder'
+    status = GinderStatus.current()
+    if status.local_name:
+        text = f'{status.local_name} - Ginder'
     else: 
         text = 'Ginder'
     layout.menu(GinderMenu.bl_idname, text = text, icon_value = preview_collections['main']["the_ginder_icon"].icon_id)
@@ -1647,8 +4741,14 @@ def draw_ginder_menu(self, context):
 # however in this example we only store 'main'
 preview_collections = {}
 
+# Time register() may take before Ginder complains on the console. Everything slow (imports of pygit2/PyGithub,
+# network access) must happen in worker threads or on first use.
+ginder_startup_budget:float = 0.1
+
 # Register and add to the "file selector" menu (required to use F3 search "Text Export Operator" for quick access).
 def register():
+    register_start = time.perf_counter()
+
     # Custom icon registration taken from https://docs.blender.org/api/4.0/bpy.utils.previews.html
     # Note that preview collections returned by bpy.utils.previews
     # are regular py objects - you can use them to store custom data.
@@ -1672,6 +4772,7 @@ def register():
     bpy.utils.register_class(RegisterWithGitHubOperator)
     bpy.utils.register_class(DeregisterFromGitHubOperator)
     bpy.utils.register_class(InstallPrerequisitesOperator)
+    bpy.utils.register_class(BuildWheelhouseOperator)
     bpy.utils.register_class(UninstallPrerequisitesOperator)
     bpy.utils.register_class(RestartBlenderOperator)
     bpy.utils.register_class(CopyRegistrationLinkOperator)
@@ -1686,19 +4787,40 @@ def register():
     bpy.utils.register_class(MergeTheirsOperator)
     bpy.utils.register_class(MergeOursOperator)
     bpy.utils.register_class(SynchronizeMenu)
+    bpy.utils.register_class(CancelTransferOperator)
+    bpy.utils.register_class(PublishOperator)
+    bpy.utils.register_class(SparseCheckoutOperator)
+    bpy.utils.register_class(SparseAddFolderOperator)
+    bpy.utils.register_class(SparseCheckoutMenu)
     bpy.utils.register_class(GinderMenu)
     bpy.types.TOPBAR_MT_file.prepend(draw_ginder_menu)
     bpy.context.preferences.use_preferences_save = True # see https://blender.stackexchange.com/questions/157677/add-on-preferences-auto-saving-bug
     GinderState.install_post_load_handler()
+    GinderState.install_post_save_handler()
+    GinderFetch.install()
 
     # Check once on startup
     UIUpdate.start_pulse()
     GinderState.init()
 
+    register_time = time.perf_counter() - register_start
+    if register_time > ginder_startup_budget:
+        print(f'Ginder: register() took {register_time*1000:.0f} ms, exceeding the startup budget of {ginder_startup_budget*1000:.0f} ms')
+
 def unregister():
     UIUpdate.stop_pulse()
+    GinderSnapshots.cancel_pending()
+    GinderFetch.uninstall()
+    GinderWatch.stop()
+    GinderLfs.unregister_filter()
+    GinderGitHub.shutdown()
     bpy.types.TOPBAR_MT_file.remove(draw_ginder_menu)
     bpy.utils.unregister_class(GinderMenu)
+    bpy.utils.unregister_class(SparseCheckoutMenu)
+    bpy.utils.unregister_class(SparseAddFolderOperator)
+    bpy.utils.unregister_class(SparseCheckoutOperator)
+    bpy.utils.unregister_class(PublishOperator)
+    bpy.utils.unregister_class(CancelTransferOperator)
     bpy.utils.unregister_class(SynchronizeMenu)
     bpy.utils.unregister_class(MergeOursOperator)
     bpy.utils.unregister_class(MergeTheirsOperator)
@@ -1713,6 +4835,7 @@ def unregister():
     bpy.utils.unregister_class(RestartBlenderOperator)
     bpy.utils.unregister_class(CopyRegistrationLinkOperator)
     bpy.utils.unregister_class(UninstallPrerequisitesOperator)
+    bpy.utils.unregister_class(BuildWheelhouseOperator)
     bpy.utils.unregister_class(InstallPrerequisitesOperator)
     bpy.utils.unregister_class(DeregisterFromGitHubOperator)
     bpy.utils.unregister_class(RegisterWithGitHubOperator)